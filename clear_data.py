@@ -50,7 +50,9 @@ def load_config_paths() -> Dict[str, Path]:
             'chroma_db': chroma_path,
             'images_processed': ROOT_DIR / 'images' / 'processed',
             'logs': ROOT_DIR / 'logs',
-            'processed_notes_file': ROOT_DIR / '.processed_notes.json',
+            'parse_cache': ROOT_DIR / '.parse_cache',
+            'processed_notes_file': ROOT_DIR / '.processed_notes.jsonl',
+            'legacy_processed_notes_file': ROOT_DIR / '.processed_notes.json',
             'query_history': ROOT_DIR / '.query_history',
             'chat_history': ROOT_DIR / '.chat_history.json'
         }
@@ -66,7 +68,9 @@ def load_config_paths() -> Dict[str, Path]:
             'chroma_db': ROOT_DIR / 'chroma_db',
             'images_processed': ROOT_DIR / 'images' / 'processed',
             'logs': ROOT_DIR / 'logs',
-            'processed_notes_file': ROOT_DIR / '.processed_notes.json',
+            'parse_cache': ROOT_DIR / '.parse_cache',
+            'processed_notes_file': ROOT_DIR / '.processed_notes.jsonl',
+            'legacy_processed_notes_file': ROOT_DIR / '.processed_notes.json',
             'query_history': ROOT_DIR / '.query_history',
             'chat_history': ROOT_DIR / '.chat_history.json'
         }
@@ -163,14 +167,14 @@ def main():
     total_count = len(paths)
     
     # Remover diretórios
-    directories = ['chroma_db', 'images_processed', 'logs']
+    directories = ['chroma_db', 'images_processed', 'logs', 'parse_cache']
     for dir_name in directories:
         if dir_name in paths:
             if clear_directory(paths[dir_name], dir_name):
                 removed_count += 1
     
     # Remover arquivos
-    files = ['processed_notes_file', 'query_history', 'chat_history']
+    files = ['processed_notes_file', 'legacy_processed_notes_file', 'query_history', 'chat_history']
     for file_name in files:
         if file_name in paths:
             if clear_file(paths[file_name], file_name):
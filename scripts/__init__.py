@@ -0,0 +1,9 @@
+"""
+Google Keep OCR Pipeline - Scripts utilitários
+==============================================
+
+Ferramentas de linha de comando sobre os módulos de src/:
+- chat_rag: Chat com Retrieval-Augmented Generation (usado também pelo web_server)
+- query_interface: Busca semântica interativa nas notas
+- auto_indexer: Indexação automática dos JSONs gerados
+"""
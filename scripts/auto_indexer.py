@@ -12,9 +12,8 @@ import time
 from pathlib import Path
 import logging
 
-# Adicionar diretório raiz ao path
+# Diretório raiz do projeto (o pacote src é importado via `pip install -e .`)
 ROOT_DIR = Path(__file__).parent.parent
-sys.path.append(str(ROOT_DIR))
 
 # Importar o módulo ChromaIndexer
 from src.chroma_indexer import index_note_in_chroma
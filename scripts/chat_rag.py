@@ -18,11 +18,10 @@ import os
 import json
 import readline
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
 
-# Adicionar diretório raiz ao path
+# Diretório raiz do projeto (o pacote src é importado via `pip install -e .`)
 ROOT_DIR = Path(__file__).parent.parent
-sys.path.append(str(ROOT_DIR))
 
 # Importar módulos necessários
 try:
@@ -34,7 +33,7 @@ except ImportError as e:
     print(f"❌ Erro ao importar módulos: {e}")
     print("\nDependências necessárias:")
     print("  - pip install openai")
-    print("  - Certifique-se de que todos os módulos estão no local correto")
+    print("  - pip install -e .  (instala o pacote src do projeto)")
     sys.exit(1)
 
 
@@ -187,16 +186,7 @@ class ChatRAG:
             # Chamar OpenAI
             response = self.openai_client.chat.completions.create(
                 model="gpt-4",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Você é um assistente pessoal inteligente que responde perguntas baseado exclusivamente nas anotações pessoais do usuário. Seja preciso, útil e cite as informações relevantes das notas quando possível."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
+                messages=self._build_messages(prompt),
                 temperature=0.7,
                 max_tokens=800
             )
@@ -204,11 +194,7 @@ class ChatRAG:
             answer = response.choices[0].message.content.strip()
             
             # Salvar na conversa
-            self.conversation_history.append({
-                "query": query,
-                "context_notes": len(context.split("--- NOTA")) - 1,
-                "response": answer[:200] + "..." if len(answer) > 200 else answer
-            })
+            self._record_conversation(query, context, answer)
             
             return answer
             
@@ -216,6 +202,79 @@ class ChatRAG:
             print(f"❌ Erro ao gerar resposta: {e}")
             return f"Desculpe, ocorreu um erro ao processar sua pergunta: {e}"
     
+    def generate_response_stream(self, query: str, context: str) -> Iterator[str]:
+        """
+        Gera resposta usando LLM com contexto RAG, devolvendo o texto à medida que chega
+        
+        Args:
+            query (str): Pergunta do usuário
+            context (str): Contexto das notas relevantes
+            
+        Yields:
+            str: Trechos da resposta (em caso de erro, a mensagem de erro)
+        """
+        parts = []
+        try:
+            prompt = self._build_rag_prompt(query, context)
+            
+            print("🤖 Gerando resposta com IA (streaming)...")
+            
+            stream = self.openai_client.chat.completions.create(
+                model="gpt-4",
+                messages=self._build_messages(prompt),
+                temperature=0.7,
+                max_tokens=800,
+                stream=True
+            )
+            
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                piece = chunk.choices[0].delta.content
+                if piece:
+                    # Espaços iniciais descartados, como no strip() da versão sem streaming
+                    if not parts:
+                        piece = piece.lstrip()
+                        if not piece:
+                            continue
+                    parts.append(piece)
+                    yield piece
+            
+            self._record_conversation(query, context, "".join(parts).strip())
+            
+        except Exception as e:
+            print(f"❌ Erro ao gerar resposta: {e}")
+            yield f"Desculpe, ocorreu um erro ao processar sua pergunta: {e}"
+    
+    def _build_messages(self, prompt: str) -> List[Dict[str, str]]:
+        """
+        Monta as mensagens do chat (instrução de sistema + prompt RAG)
+        
+        Args:
+            prompt (str): Prompt RAG já formatado
+            
+        Returns:
+            List[Dict]: Mensagens para chat.completions.create
+        """
+        return [
+            {
+                "role": "system",
+                "content": "Você é um assistente pessoal inteligente que responde perguntas baseado exclusivamente nas anotações pessoais do usuário. Seja preciso, útil e cite as informações relevantes das notas quando possível."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    
+    def _record_conversation(self, query: str, context: str, answer: str):
+        """Registra a pergunta e um resumo da resposta no histórico da conversa"""
+        self.conversation_history.append({
+            "query": query,
+            "context_notes": len(context.split("--- NOTA")) - 1,
+            "response": answer[:200] + "..." if len(answer) > 200 else answer
+        })
+    
     def _build_rag_prompt(self, query: str, context: str) -> str:
         """
         Constrói prompt otimizado para RAG
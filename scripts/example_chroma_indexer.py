@@ -6,14 +6,12 @@ Este script demonstra como indexar arquivos JSON no ChromaDB e
 realizar consultas semânticas para recuperar notas similares.
 """
 
-import sys
 import json
 from pathlib import Path
 import chromadb
 
-# Adicionar diretório raiz ao path
+# Diretório raiz do projeto (o pacote src é importado via `pip install -e .`)
 ROOT_DIR = Path(__file__).parent.parent
-sys.path.append(str(ROOT_DIR))
 
 # Importar o módulo ChromaIndexer
 from src.chroma_indexer import index_note_in_chroma, ChromaIndexer
@@ -71,10 +69,11 @@ def main():
         "lembretes importantes"
     ]
     
-    # Executar consultas
-    for query in queries:
+    # Executar consultas (todas em uma única busca, com embeddings gerados em lote)
+    batch_results = indexer.search_similar_notes_batch(queries, n_results=2)
+    
+    for query, results in zip(queries, batch_results):
         print(f"\n🔎 Consulta: '{query}'")
-        results = indexer.search_similar_notes(query, n_results=2)
         
         if results:
             print(f"✅ Encontrados {len(results)} resultados:")
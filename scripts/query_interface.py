@@ -18,9 +18,8 @@ import readline
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
-# Adicionar diretório raiz ao path
+# Diretório raiz do projeto (o pacote src é importado via `pip install -e .`)
 ROOT_DIR = Path(__file__).parent.parent
-sys.path.append(str(ROOT_DIR))
 
 # Importar módulos necessários
 try:
@@ -28,7 +27,7 @@ try:
     from src.ocr_extractor import load_keep_credentials
 except ImportError as e:
     print(f"❌ Erro ao importar módulos: {e}")
-    print("Certifique-se de que está executando do diretório raiz do projeto")
+    print("Instale o projeto em modo editável com: pip install -e .")
     sys.exit(1)
 
 
@@ -146,15 +145,20 @@ class QueryInterface:
         result_text += "\n"
         return result_text
     
-    def search_notes(self, query: str, n_results: int = None) -> List[Dict]:
+    def search_notes(self, query: str, n_results: int = None, include_documents: bool = None) -> List[Dict]:
         """Executa busca semântica"""
         try:
             # Usar configuração se não especificado
             if n_results is None:
                 n_results = self.default_chunk_count
+            # Só carregar o texto completo quando ele será exibido
+            if include_documents is None:
+                include_documents = self.show_content
                 
             print(f"🔍 Buscando: '{query}' ({n_results} resultados)...")
-            results = self.indexer.search_similar_notes(query, n_results=n_results)
+            results = self.indexer.search_similar_notes(
+                query, n_results=n_results, include_documents=include_documents
+            )
             return results or []
         except Exception as e:
             print(f"❌ Erro na busca: {e}")
@@ -185,7 +189,8 @@ class QueryInterface:
             
         result = self.last_results[note_index - 1]
         metadata = result.get('metadata', {})
-        document = result.get('document', '')
+        # Carregar sob demanda apenas o documento da nota selecionada
+        document = self.indexer.get_document(result['id'])
         
         title = metadata.get('title', 'Sem título')
         date = metadata.get('data', 'Sem data')
@@ -207,7 +212,7 @@ class QueryInterface:
         """Mostra notas recentes (baseado nos metadados disponíveis)"""
         try:
             # Buscar por termo genérico para obter algumas notas
-            results = self.indexer.search_similar_notes("nota", n_results=limit)
+            results = self.indexer.search_similar_notes("nota", n_results=limit, include_documents=False)
             
             if not results:
                 print("📭 Nenhuma nota encontrada")
@@ -228,7 +233,7 @@ class QueryInterface:
         """Lista todas as notas disponíveis com informações detalhadas"""
         try:
             # Buscar com termo muito genérico para pegar todas
-            results = self.indexer.search_similar_notes("", n_results=100)
+            results = self.indexer.search_similar_notes("", n_results=100, include_documents=False)
             
             if not results:
                 print("📭 Nenhuma nota encontrada")
@@ -387,7 +392,10 @@ class QueryInterface:
                 else:
                     # Busca semântica
                     results = self.search_notes(user_input)
-                    self.last_results = results  # Armazenar para referência
+                    # Armazenar apenas id e metadados para referência
+                    self.last_results = [
+                        {'id': r['id'], 'metadata': r.get('metadata', {})} for r in results
+                    ]
                     
                     if results:
                         print(f"\n✅ {len(results)} resultado(s) encontrado(s):")
@@ -419,7 +427,7 @@ class QueryInterface:
         if n_results is None:
             n_results = self.default_chunk_count
             
-        results = self.search_notes(query, n_results)
+        results = self.search_notes(query, n_results, include_documents=show_content)
         
         if results:
             print(f"✅ {len(results)} resultado(s) encontrado(s) para '{query}':")
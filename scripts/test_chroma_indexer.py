@@ -7,13 +7,11 @@ extraídos do OCR de notas manuscritas.
 """
 
 import os
-import sys
 import json
 from pathlib import Path
 
-# Adicionar o diretório raiz ao path para importar módulos do projeto
+# Diretório raiz do projeto (o pacote src é importado via `pip install -e .`)
 ROOT_DIR = Path(__file__).parent.parent
-sys.path.append(str(ROOT_DIR))
 
 # Importar o módulo ChromaIndexer
 from src.chroma_indexer import ChromaIndexer, index_note_in_chroma
@@ -21,6 +19,20 @@ from src.chroma_indexer import ChromaIndexer, index_note_in_chroma
 # Configurar diretório de persistência do ChromaDB para testes
 CHROMA_TEST_DIR = ROOT_DIR / "test_db"
 
+# Servidor ChromaDB opcional (ex.: `chroma run --path ./test_db`); se não definido, usa modo embarcado
+CHROMA_TEST_HOST = os.environ.get("CHROMA_TEST_HOST")
+CHROMA_TEST_PORT = int(os.environ.get("CHROMA_TEST_PORT", "8000"))
+
+
+def create_test_client():
+    """Cria cliente HTTP quando CHROMA_TEST_HOST está definido (None = PersistentClient)"""
+    if not CHROMA_TEST_HOST:
+        return None
+    
+    import chromadb
+    print(f"🌐 Usando servidor ChromaDB em {CHROMA_TEST_HOST}:{CHROMA_TEST_PORT}")
+    return chromadb.HttpClient(host=CHROMA_TEST_HOST, port=CHROMA_TEST_PORT)
+
 def test_indexing_with_real_files():
     """Testa a indexação usando arquivos JSON reais"""
     print("🧪 Testando indexação com arquivos JSON reais...")
@@ -32,7 +44,8 @@ def test_indexing_with_real_files():
     # Inicializar o ChromaIndexer com diretório de teste
     indexer = ChromaIndexer(
         collection_name="test_handwritten_notes",
-        persist_directory=str(CHROMA_TEST_DIR)
+        persist_directory=str(CHROMA_TEST_DIR),
+        client=create_test_client()
     )
     
     # Diretório com arquivos JSON para teste
@@ -90,9 +103,11 @@ def test_indexing_with_real_files():
             "análise de dados"
         ]
         
-        for query in test_queries:
+        # Todas as consultas em uma única busca (embeddings gerados em lote)
+        batch_results = indexer.search_similar_notes_batch(test_queries, n_results=2)
+        
+        for query, results in zip(test_queries, batch_results):
             print(f"\n🔎 Consulta: '{query}'")
-            results = indexer.search_similar_notes(query, n_results=2)
             
             if results:
                 print(f"✅ Encontrados {len(results)} resultados:")
@@ -6,10 +6,18 @@ Este módulo converte notas JSON estruturadas em embeddings e as indexa
 no ChromaDB para permitir consultas semânticas.
 """
 
+import os
 import json
 import hashlib
+import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict, List, Any, Optional
+import numpy as np
 import chromadb
 from chromadb import Client as ChromaClient
 from sentence_transformers import SentenceTransformer
@@ -22,37 +30,282 @@ logger = logging.getLogger(__name__)
 # Modelo para geração de embeddings (modelo multilingual otimizado)
 EMBEDDING_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
 
+# Tamanho do lote usado na geração de embeddings
+EMBEDDING_BATCH_SIZE = 64
+
+# Número de embeddings de consulta mantidos em memória por instância
+QUERY_CACHE_SIZE = 1024
+
+# Número de notas gravadas por upsert; o lote seguinte é codificado enquanto o atual é gravado
+INDEX_BATCH_SIZE = 256
+
+# Arquivo (em persist_directory) com a versão do índice, atualizada a cada gravação;
+# permite que outros processos (ex.: servidor web) detectem notas novas ou reindexadas
+INDEX_VERSION_FILE = ".index_version"
+
+# Precisões suportadas para inferência do modelo (meia precisão apenas em GPU CUDA)
+EMBEDDING_DTYPES = {"fp32", "fp16", "bf16"}
+
+# Modelo ONNX quantizado (int8) usado com backend="onnx" em CPU
+ONNX_MODEL_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
+
+def _validate_model_options(dtype: str, backend: str) -> None:
+    """
+    Valida as opções do modelo de embeddings
+    
+    Args:
+        dtype (str): Precisão solicitada
+        backend (str): Backend de inferência solicitado
+        
+    Raises:
+        ValueError: Se dtype ou backend não forem suportados
+    """
+    if dtype not in EMBEDDING_DTYPES:
+        raise ValueError(f"dtype inválido: {dtype} (use {', '.join(sorted(EMBEDDING_DTYPES))})")
+    if backend not in ("torch", "onnx"):
+        raise ValueError(f"backend inválido: {backend} (use torch ou onnx)")
+
+
+def _detect_device() -> str:
+    """
+    Detecta o melhor dispositivo disponível para o modelo de embeddings
+    
+    Returns:
+        str: "cuda", "mps" (Apple Silicon) ou "cpu"
+    """
+    import torch
+    if torch.cuda.is_available():
+        return "cuda"
+    mps = getattr(torch.backends, "mps", None)
+    if mps is not None and mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+@lru_cache(maxsize=None)
+def _load_embedding_model(dtype: str = "fp32", backend: str = "torch", device: Optional[str] = None) -> SentenceTransformer:
+    """
+    Carrega o modelo de embeddings na precisão e backend solicitados
+    
+    O modelo é carregado uma única vez por combinação (dtype, backend) e
+    compartilhado entre todas as instâncias de ChromaIndexer do processo.
+    
+    Args:
+        dtype (str): "fp32", "fp16" ou "bf16". Meia precisão só é aplicada
+            quando há GPU CUDA; caso contrário o modelo permanece em FP32.
+        backend (str): "torch" ou "onnx". O backend ONNX Runtime (int8) requer
+            sentence-transformers>=3.2 com optimum[onnxruntime]; se indisponível,
+            volta para PyTorch. Seus embeddings diferem levemente dos gerados
+            em PyTorch, então use o mesmo backend para indexar e consultar.
+        device (str, optional): Dispositivo do modelo PyTorch ("cuda", "mps",
+            "cpu"...). Se None, usa GPU CUDA ou MPS quando disponível.
+        
+    Returns:
+        SentenceTransformer: Modelo carregado
+    """
+    _validate_model_options(dtype, backend)
+    
+    if backend == "onnx":
+        try:
+            logger.info(f"🔄 Carregando modelo de embeddings: {EMBEDDING_MODEL} (ONNX Runtime)")
+            return SentenceTransformer(
+                EMBEDDING_MODEL,
+                backend="onnx",
+                model_kwargs={"file_name": ONNX_MODEL_FILE}
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Backend ONNX indisponível ({e}). Usando PyTorch")
+    
+    if device is None:
+        device = _detect_device()
+    
+    logger.info(f"🔄 Carregando modelo de embeddings: {EMBEDDING_MODEL} ({dtype}, {device})")
+    model = SentenceTransformer(EMBEDDING_MODEL, device=device)
+    
+    if dtype != "fp32":
+        if device.startswith("cuda"):
+            import torch
+            model.to(torch.float16 if dtype == "fp16" else torch.bfloat16)
+        else:
+            logger.warning(f"⚠️ {dtype} requer GPU CUDA. Usando FP32")
+    
+    return model
+
+
+def _model_tag(model: SentenceTransformer) -> str:
+    """
+    Identifica o modelo pelo backend e precisão realmente carregados
+    
+    Após um fallback ONNX → PyTorch (ou fp16 pedido sem GPU), o identificador
+    reflete o modelo em uso, e não o solicitado, para que embeddings de
+    configurações diferentes nunca se misturem no cache.
+    
+    Args:
+        model (SentenceTransformer): Modelo carregado
+        
+    Returns:
+        str: Identificador "<modelo>:<backend>:<precisão>"
+    """
+    backend = getattr(model, "backend", "torch")
+    if backend == "onnx":
+        precision = os.path.splitext(os.path.basename(ONNX_MODEL_FILE))[0]
+    else:
+        precision = str(next(model.parameters()).dtype).replace("torch.", "")
+    return f"{EMBEDDING_MODEL}:{backend}:{precision}"
+
+
+class EmbeddingCache:
+    """Cache persistente (SQLite) de embeddings indexado pelo hash SHA-256 do conteúdo"""
+    
+    # Limite de parâmetros por consulta SQL (compatível com versões antigas do SQLite)
+    _QUERY_CHUNK = 500
+    
+    def __init__(self, db_path: str, model_tag: Optional[str] = None):
+        """
+        Abre (ou cria) o cache de embeddings
+        
+        Args:
+            db_path (str): Caminho do arquivo SQLite
+            model_tag (str, optional): Identificador do modelo; embeddings de modelos
+                diferentes não se misturam. Deve ser definido antes do primeiro uso
+                (ChromaIndexer o define ao carregar o modelo)
+        """
+        self.model_tag = model_tag
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, content_hash TEXT NOT NULL, embedding BLOB NOT NULL, "
+                "PRIMARY KEY (model, content_hash))"
+            )
+    
+    def get_many(self, content_hashes: List[str]) -> Dict[str, np.ndarray]:
+        """Retorna os embeddings já calculados para os hashes informados"""
+        found = {}
+        with self._lock:
+            for start in range(0, len(content_hashes), self._QUERY_CHUNK):
+                chunk = content_hashes[start:start + self._QUERY_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT content_hash, embedding FROM embeddings "
+                    f"WHERE model = ? AND content_hash IN ({placeholders})",
+                    [self.model_tag, *chunk]
+                )
+                for content_hash, blob in rows:
+                    found[content_hash] = np.frombuffer(blob, dtype=np.float32)
+        return found
+    
+    def put_many(self, embeddings: Dict[str, np.ndarray]):
+        """Armazena embeddings (float32) indexados pelo hash do conteúdo"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, content_hash, embedding) VALUES (?, ?, ?)",
+                [(self.model_tag, content_hash, np.asarray(embedding, dtype=np.float32).tobytes())
+                 for content_hash, embedding in embeddings.items()]
+            )
+
+
 class ChromaIndexer:
     """Classe para indexar notas no ChromaDB"""
     
-    def __init__(self, collection_name: str = "handwritten_notes", persist_directory: str = "./chroma_db"):
+    def __init__(self, collection_name: str = "handwritten_notes", persist_directory: str = "./chroma_db",
+                 client: Optional[ChromaClient] = None, dtype: str = "fp32", backend: str = "torch",
+                 use_embedding_cache: bool = True, device: Optional[str] = None,
+                 dim: Optional[int] = None):
         """
         Inicializa o indexador ChromaDB
         
         Args:
             collection_name (str): Nome da coleção no ChromaDB
             persist_directory (str): Diretório para persistir o banco de dados
+            client (ChromaClient, optional): Cliente ChromaDB já criado, por exemplo
+                chromadb.HttpClient para um servidor `chroma run` (se None, usa PersistentClient)
+            dtype (str): Precisão do modelo de embeddings ("fp32", "fp16" ou "bf16")
+            backend (str): Backend de inferência ("torch" ou "onnx" para CPU)
+            use_embedding_cache (bool): Reutilizar embeddings de conteúdos já indexados
+                (cache SQLite em persist_directory). Ignorado quando `client` é informado
+                (ex.: servidor remoto), pois nada mais é gravado localmente
+            device (str, optional): Dispositivo do modelo ("cuda", "mps", "cpu"...).
+                Se None, detecta automaticamente (CUDA, depois MPS, depois CPU)
+            dim (int, optional): Truncar os embeddings para as primeiras `dim` dimensões
+                (renormalizadas), reduzindo o armazenamento. Fica registrado nos metadados
+                da coleção; se None, usa o valor da coleção existente (ou dimensão completa)
         """
         self.collection_name = collection_name
         self.persist_directory = persist_directory
         
         # Inicializar cliente ChromaDB
-        self.client = chromadb.PersistentClient(path=persist_directory)
+        self.client = client if client is not None else chromadb.PersistentClient(path=persist_directory)
+        
+        # Modelo de embeddings carregado apenas no primeiro uso (ver embedding_model)
+        _validate_model_options(dtype, backend)
+        self._dtype = dtype
+        self._backend = backend
+        self._device = device
+        self._model: Optional[SentenceTransformer] = None
+        self._model_lock = threading.Lock()
         
-        # Inicializar modelo de embeddings
-        logger.info(f"🔄 Carregando modelo de embeddings: {EMBEDDING_MODEL}")
-        self.embedding_model = SentenceTransformer(EMBEDDING_MODEL)
+        # Cache LRU de embeddings de consulta (por instância, para não reter o indexador)
+        self._embed_query = lru_cache(maxsize=QUERY_CACHE_SIZE)(self._encode_query)
+        
+        # Cache persistente de embeddings (evita recalcular notas reindexadas sem alteração)
+        self.embedding_cache = None
+        if use_embedding_cache and client is None:
+            try:
+                os.makedirs(persist_directory, exist_ok=True)
+                # O identificador do modelo é definido ao carregá-lo (ver embedding_model)
+                self.embedding_cache = EmbeddingCache(os.path.join(persist_directory, "embedding_cache.sqlite3"))
+            except Exception as e:
+                logger.warning(f"⚠️ Cache de embeddings indisponível: {e}")
+        
+        if dim is not None and dim <= 0:
+            raise ValueError(f"dim inválido: {dim}")
         
         # Criar ou obter coleção
         try:
             self.collection = self.client.get_collection(name=collection_name)
             logger.info(f"✅ Coleção '{collection_name}' carregada com sucesso")
         except Exception:
+            metadata = {"hnsw:space": "cosine"}  # Usar distância cosseno
+            if dim is not None:
+                metadata["embedding_dim"] = dim
             self.collection = self.client.create_collection(
                 name=collection_name,
-                metadata={"hnsw:space": "cosine"}  # Usar distância cosseno
+                metadata=metadata
             )
             logger.info(f"✅ Nova coleção '{collection_name}' criada")
+        
+        # Dimensão dos embeddings deve coincidir com a usada na criação da coleção
+        collection_dim = (self.collection.metadata or {}).get("embedding_dim")
+        if dim is None:
+            dim = collection_dim
+        elif collection_dim != dim:
+            raise ValueError(
+                f"Coleção '{collection_name}' usa dim={collection_dim or 'completa'}, mas dim={dim} foi solicitado"
+            )
+        self.dim = dim
+    
+    @property
+    def embedding_model(self) -> SentenceTransformer:
+        """
+        Modelo de embeddings, carregado sob demanda
+        
+        Operações que não geram embeddings (estatísticas, leitura de documentos,
+        consultas já em cache) não pagam o custo de carregar o modelo.
+        
+        Returns:
+            SentenceTransformer: Modelo carregado
+        """
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    model = _load_embedding_model(self._dtype, self._backend, self._device)
+                    if self.embedding_cache is not None:
+                        self.embedding_cache.model_tag = _model_tag(model)
+                    self._model = model
+        return self._model
     
     def _extract_content_for_embedding(self, json_data: Dict[str, Any]) -> str:
         """
@@ -74,17 +327,15 @@ class ChromaIndexer:
         if json_data.get("summary"):
             content_parts.append(f"Resumo: {json_data['summary']}")
         
-        # Adicionar notas
-        if json_data.get("notes") and isinstance(json_data["notes"], list):
-            notes_text = " ".join(json_data["notes"])
-            if notes_text.strip():
-                content_parts.append(f"Notas: {notes_text}")
+        # Adicionar notas (any() interrompe no primeiro item não vazio)
+        notes = json_data.get("notes")
+        if isinstance(notes, list) and any(note and note.strip() for note in notes):
+            content_parts.append("Notas: " + " ".join(notes))
         
         # Adicionar lembretes
-        if json_data.get("reminders") and isinstance(json_data["reminders"], list):
-            reminders_text = " ".join(json_data["reminders"])
-            if reminders_text.strip():
-                content_parts.append(f"Lembretes: {reminders_text}")
+        reminders = json_data.get("reminders")
+        if isinstance(reminders, list) and any(reminder and reminder.strip() for reminder in reminders):
+            content_parts.append("Lembretes: " + " ".join(reminders))
         
         # Adicionar tarefas (apenas o texto, não o status)
         if json_data.get("tasks") and isinstance(json_data["tasks"], list):
@@ -96,10 +347,9 @@ class ChromaIndexer:
                 content_parts.append(f"Tarefas: {' '.join(tasks_text)}")
         
         # Adicionar palavras-chave
-        if json_data.get("keywords") and isinstance(json_data["keywords"], list):
-            keywords_text = " ".join(json_data["keywords"])
-            if keywords_text.strip():
-                content_parts.append(f"Palavras-chave: {keywords_text}")
+        keywords = json_data.get("keywords")
+        if isinstance(keywords, list) and any(keyword and keyword.strip() for keyword in keywords):
+            content_parts.append("Palavras-chave: " + " ".join(keywords))
         
         return " | ".join(content_parts)
     
@@ -127,12 +377,13 @@ class ChromaIndexer:
         if json_data.get("keywords"):
             metadata["keywords"] = ", ".join(json_data["keywords"])
         
-        # Contar tarefas
+        # Contar tarefas (uma única passada pela lista)
         tasks = json_data.get("tasks", [])
         if tasks:
-            metadata["total_tasks"] = len(tasks)
-            metadata["done_tasks"] = len([t for t in tasks if t.get("status") == "done"])
-            metadata["todo_tasks"] = len([t for t in tasks if t.get("status") == "todo"])
+            statuses = Counter(t.get("status") for t in tasks if isinstance(t, dict))
+            metadata["total_tasks"] = sum(statuses.values())
+            metadata["done_tasks"] = statuses.get("done", 0)
+            metadata["todo_tasks"] = statuses.get("todo", 0)
         
         # Contar notas e lembretes
         metadata["notes_count"] = len(json_data.get("notes", []))
@@ -146,12 +397,16 @@ class ChromaIndexer:
         
         return metadata
     
-    def _generate_unique_id(self, json_data: Dict[str, Any]) -> str:
+    def _generate_unique_id(self, json_data: Dict[str, Any], content: Optional[str] = None,
+                            content_hash: Optional[str] = None) -> str:
         """
         Gera ID único para a nota baseado no conteúdo
         
         Args:
             json_data (dict): Dados JSON da nota
+            content (str, optional): Conteúdo já extraído por _extract_content_for_embedding
+                (evita extraí-lo novamente)
+            content_hash (str, optional): SHA-256 (hex) do conteúdo, se já calculado
             
         Returns:
             str: ID único
@@ -165,8 +420,11 @@ class ChromaIndexer:
             return json_data["source_id"]
         
         # Gerar hash baseado no conteúdo
-        content = self._extract_content_for_embedding(json_data)
-        return hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+        if content_hash is None:
+            if content is None:
+                content = self._extract_content_for_embedding(json_data)
+            content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        return content_hash[:16]
     
     def index_note(self, json_data: Dict[str, Any]) -> bool:
         """
@@ -178,96 +436,363 @@ class ChromaIndexer:
         Returns:
             bool: True se indexação foi bem-sucedida, False caso contrário
         """
-        try:
-            # Gerar ID único
-            unique_id = self._generate_unique_id(json_data)
+        return self.index_notes([json_data])[0]
+    
+    def _truncate(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Trunca embeddings para self.dim dimensões e renormaliza (norma L2 = 1)
+        
+        Args:
+            embeddings (np.ndarray): Vetor ou matriz de embeddings completos
             
-            # Verificar se já existe
-            existing = None
-            try:
-                existing = self.collection.get(ids=[unique_id])
-                if existing["ids"]:
-                    logger.info(f"🔄 Nota {unique_id} já existe. Atualizando...")
-            except Exception:
-                pass  # Nota não existe, continuar com inserção
+        Returns:
+            np.ndarray: Embeddings truncados (ou os originais se dim não definido)
+        """
+        if self.dim is None:
+            return embeddings
+        truncated = embeddings[..., :self.dim]
+        norms = np.linalg.norm(truncated, axis=-1, keepdims=True)
+        return truncated / np.maximum(norms, 1e-12)
+    
+    def _encode_contents(self, contents: List[str], hashes: Optional[List[str]] = None) -> np.ndarray:
+        """
+        Gera embeddings em lote, reutilizando os que já estão no cache persistente
+        
+        Args:
+            contents (List[str]): Textos para embedding
+            hashes (List[str], optional): SHA-256 (hex) de cada texto, se já calculados
             
-            # Extrair conteúdo para embedding
-            content = self._extract_content_for_embedding(json_data)
-            if not content.strip():
-                logger.warning(f"⚠️ Conteúdo vazio para nota {unique_id}")
-                return False
+        Returns:
+            np.ndarray: Matriz float32 (len(contents), dimensão) na mesma ordem da entrada
+        """
+        # Carregar o modelo primeiro: ele define o identificador usado no cache
+        model = self.embedding_model
+        
+        if self.embedding_cache is None:
+            return self._truncate(model.encode(
+                contents,
+                batch_size=EMBEDDING_BATCH_SIZE,
+                show_progress_bar=False,
+                convert_to_numpy=True
+            ).astype(np.float32, copy=False))
+        
+        if hashes is None:
+            hashes = [hashlib.sha256(content.encode('utf-8')).hexdigest() for content in contents]
+        try:
+            cached = self.embedding_cache.get_many(hashes)
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao ler cache de embeddings: {e}")
+            cached = {}
+        
+        missing = [i for i, content_hash in enumerate(hashes) if content_hash not in cached]
+        if missing:
+            logger.debug("🔄 Gerando embeddings para %d nota(s) (%d em cache)", len(missing), len(contents) - len(missing))
+            new_embeddings = model.encode(
+                [contents[i] for i in missing],
+                batch_size=EMBEDDING_BATCH_SIZE,
+                show_progress_bar=False,
+                convert_to_numpy=True
+            )
+            computed = {hashes[i]: embedding for i, embedding in zip(missing, new_embeddings)}
+            try:
+                self.embedding_cache.put_many(computed)
+            except Exception as e:
+                logger.warning(f"⚠️ Erro ao gravar cache de embeddings: {e}")
+            cached.update(computed)
+        else:
+            logger.debug("♻️ Embeddings de %d nota(s) recuperados do cache", len(contents))
+        
+        # O cache guarda os embeddings completos; o truncamento é aplicado na saída
+        return self._truncate(np.stack([cached[content_hash] for content_hash in hashes]).astype(np.float32, copy=False))
+    
+    def _encode_batch(self, batch: List[tuple]) -> np.ndarray:
+        """
+        Gera os embeddings de um lote de entradas preparadas por index_notes
+        
+        Args:
+            batch (List[tuple]): Pares (ID, entrada) com conteúdo e hash do conteúdo
             
-            # Gerar embedding
-            logger.info(f"🔄 Gerando embedding para nota {unique_id}")
-            embedding = self.embedding_model.encode(content).tolist()
+        Returns:
+            np.ndarray: Matriz float32 de embeddings na mesma ordem do lote
+        """
+        return self._encode_contents(
+            [entry["content"] for _, entry in batch],
+            hashes=[entry["content_hash"] for _, entry in batch]
+        )
+    
+    def index_notes(self, notes: List[Dict[str, Any]]) -> List[bool]:
+        """
+        Indexa várias notas no ChromaDB com uma única geração de embeddings
+        
+        Os embeddings são calculados em lote e gravados com upsert (insere
+        novas notas e atualiza as existentes), em lotes de INDEX_BATCH_SIZE
+        notas: o lote seguinte é codificado enquanto o atual é gravado.
+        
+        Args:
+            notes (List[dict]): Lista de dados JSON estruturados das notas
             
-            # Preparar metadados
-            metadata = self._prepare_metadata(json_data)
+        Returns:
+            List[bool]: Resultado da indexação de cada nota, na mesma ordem da entrada
+        """
+        start_time = time.perf_counter()
+        status = [False] * len(notes)
+        
+        # Preparar entradas (IDs repetidos no lote ficam com a última versão)
+        entries: Dict[str, Dict[str, Any]] = {}
+        for position, json_data in enumerate(notes):
+            try:
+                # Extrair conteúdo e calcular seu hash uma única vez
+                # (reutilizados no ID e na chave do cache de embeddings)
+                content = self._extract_content_for_embedding(json_data)
+                content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+                unique_id = self._generate_unique_id(json_data, content=content, content_hash=content_hash)
+                
+                if not content.strip():
+                    logger.warning(f"⚠️ Conteúdo vazio para nota {unique_id}")
+                    continue
+                
+                positions = entries.pop(unique_id, {}).get("positions", [])
+                entries[unique_id] = {
+                    "content": content,
+                    "content_hash": content_hash,
+                    "metadata": self._prepare_metadata(json_data),
+                    "positions": positions + [position]
+                }
+            except Exception as e:
+                logger.error(f"❌ Erro ao preparar nota para indexação: {e}")
+        
+        if not entries:
+            return status
+        
+        # Dividir em lotes: enquanto um lote é gravado no ChromaDB, o próximo
+        # já tem seus embeddings gerados em segundo plano
+        items = list(entries.items())
+        batches = [items[i:i + INDEX_BATCH_SIZE] for i in range(0, len(items), INDEX_BATCH_SIZE)]
+        
+        indexed_count = 0
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            encode_future = executor.submit(self._encode_batch, batches[0])
             
-            # Indexar ou atualizar no ChromaDB
-            if existing and existing["ids"]:
-                # Atualizar entrada existente
-                self.collection.update(
-                    ids=[unique_id],
-                    embeddings=[embedding],
-                    metadatas=[metadata],
-                    documents=[content]
-                )
-                logger.info(f"✅ Nota {unique_id} atualizada com sucesso")
-            else:
-                # Inserir nova entrada
-                self.collection.add(
-                    ids=[unique_id],
-                    embeddings=[embedding],
-                    metadatas=[metadata],
-                    documents=[content]
-                )
-                logger.info(f"✅ Nota {unique_id} indexada com sucesso")
+            for index, batch in enumerate(batches):
+                ids = [unique_id for unique_id, _ in batch]
+                contents = [entry["content"] for _, entry in batch]
+                
+                try:
+                    embeddings = encode_future.result()
+                except Exception as e:
+                    logger.error(f"❌ Erro ao gerar embeddings: {e}")
+                    embeddings = None
+                
+                # Iniciar a codificação do próximo lote antes de gravar o atual
+                if index + 1 < len(batches):
+                    encode_future = executor.submit(self._encode_batch, batches[index + 1])
+                
+                if embeddings is None:
+                    continue
+                
+                try:
+                    # Inserir ou atualizar as notas do lote (sem consulta prévia por ID)
+                    self.collection.upsert(
+                        ids=ids,
+                        embeddings=embeddings,
+                        metadatas=[entry["metadata"] for _, entry in batch],
+                        documents=contents
+                    )
+                    logger.debug("Lote %d/%d gravado: %d nota(s)", index + 1, len(batches), len(ids))
+                except Exception as e:
+                    logger.error(f"❌ Erro ao indexar notas: {e}")
+                    continue
+                
+                indexed_count += len(ids)
+                for _, entry in batch:
+                    for position in entry["positions"]:
+                        status[position] = True
+        
+        if indexed_count:
+            self._bump_index_version()
+            elapsed = time.perf_counter() - start_time
+            logger.info(
+                f"✅ {indexed_count} nota(s) indexada(s) em {elapsed:.2f}s "
+                f"({indexed_count / max(elapsed, 1e-9):.0f} notas/s)"
+            )
+        
+        return status
+    
+    def _bump_index_version(self):
+        """Registra uma nova versão do índice (upserts de IDs existentes não alteram count())"""
+        try:
+            os.makedirs(self.persist_directory, exist_ok=True)
+            with open(os.path.join(self.persist_directory, INDEX_VERSION_FILE), "w", encoding="utf-8") as f:
+                f.write(str(time.time_ns()))
+        except OSError as e:
+            logger.warning(f"⚠️ Não foi possível atualizar a versão do índice: {e}")
+    
+    def get_index_version(self) -> Optional[str]:
+        """
+        Retorna a versão atual do índice (muda sempre que notas são indexadas ou reindexadas)
+        
+        Returns:
+            Optional[str]: Versão do índice, ou None se nenhuma gravação foi registrada
+        """
+        try:
+            with open(os.path.join(self.persist_directory, INDEX_VERSION_FILE), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+    
+    def _encode_query(self, query: str) -> np.ndarray:
+        """
+        Gera o embedding de uma consulta (usado através do cache self._embed_query)
+        
+        Args:
+            query (str): Texto da consulta
             
-            return True
+        Returns:
+            np.ndarray: Vetor float32 somente leitura, compartilhado entre chamadas
+        """
+        embedding = self._truncate(self.embedding_model.encode(query, convert_to_numpy=True).astype(np.float32, copy=False))
+        embedding.setflags(write=False)
+        return embedding
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """
+        Retorna o embedding de uma consulta, reaproveitando o cache de consultas
+        (uma busca posterior com o mesmo texto não recodifica a consulta)
+        
+        Args:
+            query (str): Texto da consulta
             
-        except Exception as e:
-            logger.error(f"❌ Erro ao indexar nota: {e}")
-            return False
+        Returns:
+            np.ndarray: Vetor float32 somente leitura
+        """
+        return self._embed_query(query)
     
-    def search_similar_notes(self, query: str, n_results: int = 5) -> List[Dict[str, Any]]:
+    def search_similar_notes(self, query: str, n_results: int = 5, include_documents: bool = True) -> List[Dict[str, Any]]:
         """
         Busca notas similares usando consulta semântica
         
         Args:
             query (str): Texto da consulta
             n_results (int): Número máximo de resultados
+            include_documents (bool): Se False, não carrega o texto completo das
+                notas (campo "document" fica vazio), reduzindo os dados lidos do banco
             
         Returns:
             List[Dict]: Lista de notas similares com metadados
         """
         try:
             # Gerar embedding da consulta
-            query_embedding = self.embedding_model.encode(query).tolist()
+            query_embedding = self._embed_query(query)
+            
+            # Buscar no ChromaDB (documentos apenas quando solicitados)
+            include = ["metadatas", "distances"]
+            if include_documents:
+                include.append("documents")
             
-            # Buscar no ChromaDB
             results = self.collection.query(
                 query_embeddings=[query_embedding],
                 n_results=n_results,
-                include=["documents", "metadatas", "distances"]
+                include=include
             )
             
-            # Formatar resultados
-            formatted_results = []
-            for i, doc_id in enumerate(results["ids"][0]):
-                formatted_results.append({
-                    "id": doc_id,
-                    "document": results["documents"][0][i],
-                    "metadata": results["metadatas"][0][i],
-                    "similarity": 1 - results["distances"][0][i]  # Converter distância para similaridade
-                })
-            
-            return formatted_results
+            return self._format_query_results(results, 0, include_documents)
             
         except Exception as e:
             logger.error(f"❌ Erro na busca semântica: {e}")
             return []
     
+    def search_similar_notes_batch(self, queries: List[str], n_results: int = 5,
+                                   include_documents: bool = True) -> List[List[Dict[str, Any]]]:
+        """
+        Busca notas similares para várias consultas de uma só vez
+        
+        Os embeddings das consultas são gerados em um único lote e a busca é feita
+        com uma única chamada collection.query, em vez de uma por consulta.
+        
+        Args:
+            queries (List[str]): Textos das consultas
+            n_results (int): Número máximo de resultados por consulta
+            include_documents (bool): Se False, não carrega o texto completo das notas
+            
+        Returns:
+            List[List[Dict]]: Resultados de cada consulta, na mesma ordem da entrada
+        """
+        if not queries:
+            return []
+        
+        try:
+            query_embeddings = self._truncate(self.embedding_model.encode(
+                list(queries),
+                batch_size=EMBEDDING_BATCH_SIZE,
+                show_progress_bar=False,
+                convert_to_numpy=True
+            ).astype(np.float32, copy=False))
+            
+            include = ["metadatas", "distances"]
+            if include_documents:
+                include.append("documents")
+            
+            results = self.collection.query(
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                include=include
+            )
+            
+            return [
+                self._format_query_results(results, i, include_documents)
+                for i in range(len(queries))
+            ]
+            
+        except Exception as e:
+            logger.error(f"❌ Erro na busca semântica em lote: {e}")
+            return [[] for _ in queries]
+    
+    @staticmethod
+    def _format_query_results(results: Dict[str, Any], index: int, include_documents: bool) -> List[Dict[str, Any]]:
+        """
+        Converte o resultado de uma consulta do collection.query em lista de notas
+        
+        Args:
+            results (Dict): Retorno do collection.query
+            index (int): Posição da consulta no lote
+            include_documents (bool): Se os documentos foram carregados
+            
+        Returns:
+            List[Dict]: Notas com id, documento, metadados e similaridade
+        """
+        # Documentos vazios quando não solicitados
+        ids = results["ids"][index]
+        documents = results["documents"][index] if include_documents else [""] * len(ids)
+        return [
+            {
+                "id": doc_id,
+                "document": document,
+                "metadata": metadata,
+                "similarity": 1 - distance  # Converter distância para similaridade
+            }
+            for doc_id, document, metadata, distance in zip(
+                ids, documents, results["metadatas"][index], results["distances"][index]
+            )
+        ]
+    
+    def get_document(self, note_id: str) -> Optional[str]:
+        """
+        Carrega o texto completo de uma única nota
+        
+        Args:
+            note_id (str): ID da nota no ChromaDB
+            
+        Returns:
+            Optional[str]: Documento da nota ou None se não encontrado
+        """
+        try:
+            result = self.collection.get(ids=[note_id], include=["documents"])
+            documents = result.get("documents") or []
+            return documents[0] if documents else None
+        except Exception as e:
+            logger.error(f"❌ Erro ao carregar documento {note_id}: {e}")
+            return None
+    
     def get_collection_stats(self) -> Dict[str, Any]:
         """
         Retorna estatísticas da coleção
@@ -280,13 +805,40 @@ class ChromaIndexer:
             return {
                 "total_notes": count,
                 "collection_name": self.collection_name,
-                "persist_directory": self.persist_directory
+                "persist_directory": self.persist_directory,
+                "embedding_dim": self.dim
             }
         except Exception as e:
             logger.error(f"❌ Erro ao obter estatísticas: {e}")
             return {"error": str(e)}
 
 
+_INDEXER_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=4)
+def _create_indexer(persist_directory: str, chroma_client: Optional[ChromaClient]) -> ChromaIndexer:
+    """Cria (uma vez por diretório/cliente) o indexador usado por _get_indexer"""
+    return ChromaIndexer(persist_directory=persist_directory, client=chroma_client)
+
+
+def _get_indexer(persist_directory: str = "./chroma_db", chroma_client: Optional[ChromaClient] = None) -> ChromaIndexer:
+    """
+    Retorna um ChromaIndexer reutilizável para o diretório/cliente informado
+    
+    Args:
+        persist_directory (str): Diretório para persistir o banco de dados ChromaDB
+        chroma_client (ChromaClient, optional): Cliente ChromaDB (se None, usa PersistentClient)
+        
+    Returns:
+        ChromaIndexer: Indexador em cache
+    """
+    # Serializado para que chamadas simultâneas (pipeline com threads) não criem
+    # dois indexadores para o mesmo destino
+    with _INDEXER_LOCK:
+        return _create_indexer(persist_directory, chroma_client)
+
+
 def index_note_in_chroma(json_data: Dict[str, Any], persist_directory: str = "./chroma_db", chroma_client: ChromaClient = None) -> bool:
     """
     Função de conveniência para indexar uma nota no ChromaDB
@@ -300,25 +852,8 @@ def index_note_in_chroma(json_data: Dict[str, Any], persist_directory: str = "./
         bool: True se indexação foi bem-sucedida, False caso contrário
     """
     try:
-        # Se não foi fornecido cliente, criar novo indexador
-        if chroma_client is None:
-            indexer = ChromaIndexer(persist_directory=persist_directory)
-        else:
-            # Usar cliente fornecido - criar indexador customizado
-            indexer = ChromaIndexer(persist_directory=persist_directory)
-            # Substituir o cliente padrão pelo fornecido
-            indexer.client = chroma_client
-            # Recriar a coleção com o cliente fornecido
-            try:
-                indexer.collection = chroma_client.get_collection(name=indexer.collection_name)
-                logger.info(f"✅ Usando coleção existente '{indexer.collection_name}' do cliente fornecido")
-            except Exception:
-                indexer.collection = chroma_client.create_collection(
-                    name=indexer.collection_name,
-                    metadata={"hnsw:space": "cosine"}
-                )
-                logger.info(f"✅ Nova coleção '{indexer.collection_name}' criada no cliente fornecido")
-        
+        # Reutilizar o indexador (e seu cliente) entre chamadas
+        indexer = _get_indexer(persist_directory, chroma_client)
         return indexer.index_note(json_data)
         
     except Exception as e:
@@ -326,6 +861,27 @@ def index_note_in_chroma(json_data: Dict[str, Any], persist_directory: str = "./
         return False
 
 
+def index_notes_in_chroma(notes: List[Dict[str, Any]], persist_directory: str = "./chroma_db",
+                          chroma_client: ChromaClient = None) -> List[bool]:
+    """
+    Função de conveniência para indexar várias notas no ChromaDB em lote
+    
+    Args:
+        notes (List[dict]): Dados JSON estruturados das notas
+        persist_directory (str): Diretório para persistir o banco de dados ChromaDB
+        chroma_client (ChromaClient, optional): Cliente ChromaDB (se None, cria novo)
+        
+    Returns:
+        List[bool]: Resultado da indexação de cada nota, na mesma ordem da entrada
+    """
+    try:
+        return _get_indexer(persist_directory, chroma_client).index_notes(notes)
+        
+    except Exception as e:
+        logger.error(f"❌ Erro na função index_notes_in_chroma: {e}")
+        return [False] * len(notes)
+
+
 if __name__ == "__main__":
     # Teste básico
     print("🧪 Testando ChromaIndexer...")
@@ -18,11 +18,16 @@ Versão: 2.0.0
 
 import sys
 import os
+import errno
+import hashlib
 import json
 import shutil
 import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Any, Optional
 
 # Carregar variáveis de ambiente
@@ -63,14 +68,16 @@ try:
     from src.ocr_extractor import (
         connect_to_keep, 
         load_keep_credentials,
-        transcribe_handwriting,
-        download_blob,
-        encode_image_to_base64
+        transcribe_handwriting_multi,
+        sniff_image_format,
+        prepare_for_vision,
+        image_data_url,
+        download_blob
     )
     
     # Importar módulos de parsing
     from src.parser import parse_ocr_text
-    from src.chroma_indexer import index_note_in_chroma
+    from src.chroma_indexer import index_note_in_chroma, index_notes_in_chroma
     
     logger.info("✅ Todos os módulos importados com sucesso")
     
@@ -88,7 +95,26 @@ __date__ = "27/06/2025"
 IMAGES_DIR = ROOT_DIR / "images"
 PROCESSED_DIR = IMAGES_DIR / "processed"
 CHROMA_DB_DIR = ROOT_DIR / "chroma_db"  # Padrão, será atualizado
-PROCESSED_NOTES_FILE = ROOT_DIR / ".processed_notes.json"
+# Cache em disco das estruturações do LLM (um arquivo por SHA-256 do texto OCR)
+PARSE_CACHE_DIR = ROOT_DIR / ".parse_cache"
+
+# Registro append-only (uma linha JSON por nota processada)
+PROCESSED_NOTES_FILE = ROOT_DIR / ".processed_notes.jsonl"
+# Registro antigo (JSON completo); lido apenas para manter compatibilidade
+LEGACY_PROCESSED_NOTES_FILE = ROOT_DIR / ".processed_notes.json"
+
+# Registro de notas processadas em memória (lido do disco uma vez, atualizado a cada gravação)
+_PROCESSED_CACHE: Optional[Dict[str, List[str]]] = None
+_PROCESSED_LOCK = threading.Lock()
+
+# Número de imagens processadas em paralelo (OCR, estruturação e indexação são limitados por rede)
+OCR_WORKERS = max(1, int(os.environ.get("KEEP_OCR_WORKERS", "6")))
+
+# Número de notas estruturadas acumuladas antes de cada indexação em lote no ChromaDB
+INDEX_BATCH_SIZE = 32
+
+# Número de anexos baixados em paralelo do Google Keep
+DOWNLOAD_WORKERS = max(1, int(os.environ.get("KEEP_DOWNLOAD_WORKERS", "8")))
 
 
 def load_config_paths():
@@ -154,34 +180,64 @@ def setup_api_keys():
 
 
 def load_processed_notes() -> Dict[str, List[str]]:
-    """Carrega a lista de IDs de notas já processadas"""
-    if not PROCESSED_NOTES_FILE.exists():
-        return {}
+    """
+    Carrega a lista de IDs de notas já processadas (lida do disco apenas uma vez)
+    
+    Combina o registro antigo em JSON (se existir) com as linhas do registro
+    append-only; linhas inválidas (ex.: gravação interrompida) são ignoradas.
+    """
+    global _PROCESSED_CACHE
+    
+    if _PROCESSED_CACHE is not None:
+        return _PROCESSED_CACHE
+    
+    processed_notes: Dict[str, List[str]] = {}
+    seen = set()
+    
+    def add(label_name: str, note_id: str):
+        if (label_name, note_id) not in seen:
+            seen.add((label_name, note_id))
+            processed_notes.setdefault(label_name, []).append(note_id)
     
     try:
-        with open(PROCESSED_NOTES_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        if LEGACY_PROCESSED_NOTES_FILE.exists():
+            with open(LEGACY_PROCESSED_NOTES_FILE, 'r', encoding='utf-8') as f:
+                for label_name, note_ids in json.load(f).items():
+                    for note_id in note_ids:
+                        add(label_name, note_id)
+        
+        if PROCESSED_NOTES_FILE.exists():
+            with open(PROCESSED_NOTES_FILE, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        add(record["label"], record["id"])
+                    except (ValueError, KeyError, TypeError):
+                        continue
     except Exception as e:
-        print(f"⚠️ Erro ao carregar registro de notas processadas: {e}")
+        logger.warning("⚠️ Erro ao carregar registro de notas processadas: %s", e)
         return {}
+    
+    _PROCESSED_CACHE = processed_notes
+    return _PROCESSED_CACHE
 
 
 def save_processed_note(note_id: str, label_name: str = "main_pipeline"):
-    """Adiciona uma nota ao registro de notas processadas"""
-    processed_notes = load_processed_notes()
-    
-    if label_name not in processed_notes:
-        processed_notes[label_name] = []
-    
-    if note_id not in processed_notes[label_name]:
-        processed_notes[label_name].append(note_id)
-    
-    try:
-        with open(PROCESSED_NOTES_FILE, 'w', encoding='utf-8') as f:
-            json.dump(processed_notes, f, indent=2, ensure_ascii=False)
-        print(f"📝 Nota {note_id[:8]} registrada como processada")
-    except Exception as e:
-        print(f"⚠️ Erro ao salvar registro: {e}")
+    """Adiciona uma nota ao registro de notas processadas (seguro entre threads)"""
+    with _PROCESSED_LOCK:
+        processed_notes = load_processed_notes()
+        
+        if note_id in processed_notes.get(label_name, ()):
+            return
+        
+        try:
+            # Apenas acrescenta uma linha: o custo não cresce com o histórico
+            with open(PROCESSED_NOTES_FILE, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"label": label_name, "id": note_id}, ensure_ascii=False) + "\n")
+            processed_notes.setdefault(label_name, []).append(note_id)
+            logger.debug("📝 Nota %s registrada como processada", note_id[:8])
+        except Exception as e:
+            logger.warning("⚠️ Erro ao salvar registro: %s", e)
 
 
 def is_note_processed(note_id: str, label_name: str = "main_pipeline") -> bool:
@@ -191,66 +247,161 @@ def is_note_processed(note_id: str, label_name: str = "main_pipeline") -> bool:
             note_id in processed_notes[label_name])
 
 
-def get_new_notes_with_images(keep, label_name: Optional[str] = None) -> List[Any]:
+def get_pipeline_label(label_name: Optional[str] = None) -> str:
+    """
+    Retorna a chave do registro de notas processadas para a label informada
+    
+    Args:
+        label_name: Nome da label filtrada (opcional)
+    
+    Returns:
+        "main_pipeline" ou "main_pipeline_<label>"
+    """
+    return f"main_pipeline_{label_name}" if label_name else "main_pipeline"
+
+
+def get_new_notes_with_images(keep, label_name: Optional[str] = None,
+                              pipeline_label: Optional[str] = None) -> List[Any]:
     """
     Busca notas de HOJE com imagens que ainda não foram processadas
     
     Args:
         keep: Instância conectada do Google Keep
         label_name: Nome da label para filtrar (opcional)
+        pipeline_label: Chave do registro de notas processadas
+            (padrão: get_pipeline_label(label_name))
     
     Returns:
         Lista de notas de hoje não processadas com anexos de imagem
     """
     # Data atual (timezone local do sistema)
-    hoje = datetime.now().date()
-    print(f"🔍 Buscando notas de HOJE ({hoje.strftime('%d/%m/%Y')}) com imagens não processadas...")
+    hoje_inicio = datetime.now().astimezone().replace(hour=0, minute=0, second=0, microsecond=0)
+    hoje = hoje_inicio.date()
+    
+    # Limites de hoje convertidos uma única vez para UTC sem tzinfo, o mesmo formato
+    # de note.timestamps.updated (evita converter o timestamp de cada nota)
+    inicio_utc = hoje_inicio.astimezone(timezone.utc).replace(tzinfo=None)
+    fim_utc = (hoje_inicio + timedelta(days=1)).astimezone(timezone.utc).replace(tzinfo=None)
+    logger.info("🔍 Buscando notas de HOJE (%s) com imagens não processadas...", hoje.strftime('%d/%m/%Y'))
     
     try:
         if label_name:
-            print(f"🏷️ Filtrando por label: {label_name}")
+            logger.info("🏷️ Filtrando por label: %s", label_name)
             label = keep.findLabel(label_name)
             if not label:
-                print(f"⚠️ Label '{label_name}' não encontrada")
+                logger.warning("⚠️ Label '%s' não encontrada", label_name)
                 return []
-            notes = list(keep.find(labels=[label]))
+            notes = keep.find(labels=[label])
         else:
-            print("📋 Buscando em todas as notas")
-            notes = list(keep.all())
-        
-        print(f"📊 Total de notas encontradas: {len(notes)}")
-        
-        # Filtrar notas de HOJE (convertendo timestamps UTC para timezone local)
-        notes_today = []
+            logger.info("📋 Buscando em todas as notas")
+            notes = keep.all()
+        
+        if pipeline_label is None:
+            pipeline_label = get_pipeline_label(label_name)
+        processed_ids = frozenset(load_processed_notes().get(pipeline_label, ()))
+        
+        # Filtrar em uma única passada, consumindo as notas sob demanda: notas de HOJE
+        # (timestamps UTC comparados com os limites de hoje em UTC), com anexos e
+        # ainda não processadas
+        total_count = 0
+        today_count = 0
+        with_blobs_count = 0
+        new_notes = []
         for note in notes:
-            # Converter timestamp UTC para local
-            note_date_local = note.timestamps.updated.replace(tzinfo=timezone.utc).astimezone().date()
-            if note_date_local == hoje:
-                notes_today.append(note)
-        print(f"📅 Notas de hoje: {len(notes_today)}")
+            total_count += 1
+            if not inicio_utc <= note.timestamps.updated < fim_utc:
+                continue
+            today_count += 1
+            if not getattr(note, 'blobs', None):
+                continue
+            with_blobs_count += 1
+            if note.id not in processed_ids:
+                new_notes.append(note)
         
-        # Filtrar notas com anexos
-        notes_with_blobs = []
-        for note in notes_today:
-            if hasattr(note, 'blobs') and note.blobs:
-                notes_with_blobs.append(note)
+        logger.info("📊 Total de notas encontradas: %d", total_count)
+        logger.info("📅 Notas de hoje: %d", today_count)
+        logger.info("📎 Notas de hoje com anexos: %d", with_blobs_count)
+        logger.info("🆕 Notas de hoje novas para processar: %d", len(new_notes))
+        return new_notes
         
-        print(f"📎 Notas de hoje com anexos: {len(notes_with_blobs)}")
+    except Exception as e:
+        logger.error("❌ Erro ao buscar notas: %s", e)
+        return []
+
+
+def _fast_move(src: Path, dst: Path):
+    """
+    Move um arquivo com os.replace (rename atômico no mesmo sistema de arquivos)
+    
+    Usa shutil.move (cópia + remoção) apenas quando origem e destino estão em
+    sistemas de arquivos diferentes.
+    
+    Args:
+        src: Caminho de origem
+        dst: Caminho de destino (substituído se existir)
+    """
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(str(src), str(dst))
+
+
+def download_note_image(keep, note, blob, index: int) -> Optional[Path]:
+    """
+    Baixa um anexo de uma nota para IMAGES_DIR
+    
+    Args:
+        keep: Instância do Google Keep
+        note: Nota do Google Keep
+        blob: Anexo a baixar
+        index: Posição do anexo na nota
+    
+    Returns:
+        Caminho da imagem baixada ou None se falhar
+    """
+    try:
+        logger.debug("📷 Processando anexo %d/%d...", index + 1, len(note.blobs))
         
-        # Filtrar notas não processadas
-        new_notes = []
-        pipeline_label = f"main_pipeline_{label_name}" if label_name else "main_pipeline"
+        # Baixar o blob usando a função existente (cliente passado explicitamente)
+        img_path = download_blob(blob, note.title or "sem_titulo", index, keep)
         
-        for note in notes_with_blobs:
-            if not is_note_processed(note.id, pipeline_label):
-                new_notes.append(note)
+        if img_path and img_path.exists():
+            # Mover para o diretório correto se necessário
+            if img_path.parent != IMAGES_DIR:
+                new_path = IMAGES_DIR / img_path.name
+                _fast_move(img_path, new_path)
+                img_path = new_path
+            
+            logger.info("✅ Imagem salva: %s", img_path)
+            return img_path
         
-        print(f"🆕 Notas de hoje novas para processar: {len(new_notes)}")
-        return new_notes
+        logger.warning("❌ Falha ao baixar anexo %d", index + 1)
+        return None
         
     except Exception as e:
-        print(f"❌ Erro ao buscar notas: {e}")
-        return []
+        logger.warning("⚠️ Erro ao processar anexo %d: %s", index + 1, e)
+        return None
+
+
+def submit_note_image_downloads(keep, note, executor: ThreadPoolExecutor) -> List["Future[Optional[Path]]"]:
+    """
+    Agenda o download de todos os anexos de uma nota
+    
+    Args:
+        keep: Instância do Google Keep
+        note: Nota do Google Keep
+        executor: Executor onde os downloads serão executados
+    
+    Returns:
+        Lista de futures com o caminho de cada imagem (None se o download falhar)
+    """
+    logger.info("📥 Baixando imagens da nota: %s", note.title or 'Sem título')
+    return [
+        executor.submit(download_note_image, keep, note, blob, i)
+        for i, blob in enumerate(note.blobs)
+    ]
 
 
 def download_note_images(keep, note) -> List[Path]:
@@ -264,36 +415,13 @@ def download_note_images(keep, note) -> List[Path]:
     Returns:
         Lista de caminhos das imagens baixadas
     """
-    print(f"📥 Baixando imagens da nota: {note.title or 'Sem título'}")
+    logger.info("📥 Baixando imagens da nota: %s", note.title or 'Sem título')
     
     downloaded_images = []
-    
     for i, blob in enumerate(note.blobs):
-        try:
-            print(f"📷 Processando anexo {i+1}/{len(note.blobs)}...")
-            
-            # Definir keep como variável global temporariamente para compatibilidade
-            import ocr_extractor
-            ocr_extractor.keep = keep
-            
-            # Baixar o blob usando a função existente
-            img_path = download_blob(blob, note.title or "sem_titulo", i, keep)
-            
-            if img_path and img_path.exists():
-                # Mover para o diretório correto se necessário
-                if img_path.parent != IMAGES_DIR:
-                    new_path = IMAGES_DIR / img_path.name
-                    shutil.move(str(img_path), str(new_path))
-                    img_path = new_path
-                
-                print(f"✅ Imagem salva: {img_path}")
-                downloaded_images.append(img_path)
-            else:
-                print(f"❌ Falha ao baixar anexo {i+1}")
-                
-        except Exception as e:
-            print(f"⚠️ Erro ao processar anexo {i+1}: {e}")
-            continue
+        img_path = download_note_image(keep, note, blob, i)
+        if img_path:
+            downloaded_images.append(img_path)
     
     return downloaded_images
 
@@ -308,25 +436,70 @@ def process_image_ocr(image_path: Path) -> str:
     Returns:
         Texto extraído da imagem
     """
-    print(f"🔍 Executando OCR em: {image_path.name}")
+    logger.info("🔍 Executando OCR em: %s", image_path.name)
     
     try:
-        # Validar que é uma imagem
-        from PIL import Image
-        with Image.open(image_path) as img:
-            print(f"📊 Imagem validada - Formato: {img.format}, Tamanho: {img.size}")
+        # Ler a imagem uma única vez e validar pelo cabeçalho (sem decodificá-la)
+        image_bytes = image_path.read_bytes()
+        image_format = sniff_image_format(image_bytes[:32])
+        if not image_format:
+            raise ValueError(f"Arquivo não é uma imagem suportada: {image_path.name}")
+        logger.debug("📊 Imagem validada - Formato: %s, Tamanho: %d bytes", image_format, len(image_bytes))
+        
+        # Reduzir/recomprimir imagens grandes antes do envio (mantém a original se já for pequena)
+        image_bytes, mime = prepare_for_vision(image_bytes, f"image/{image_format.lower()}")
         
-        # Executar OCR usando a função existente
-        extracted_text = transcribe_handwriting(str(image_path))
+        # Executar OCR com os bytes já lidos, informando o tipo MIME real da imagem
+        extracted_text = transcribe_handwriting_multi([image_data_url(image_bytes, mime)])
         
-        print(f"✅ OCR concluído - {len(extracted_text)} caracteres extraídos")
+        logger.info("✅ OCR concluído - %d caracteres extraídos", len(extracted_text))
         return extracted_text
         
     except Exception as e:
-        print(f"❌ Erro no OCR: {e}")
+        logger.error("❌ Erro no OCR: %s", e)
         raise
 
 
+@lru_cache(maxsize=512)
+def _parse_cached(text_hash: str, text: str) -> str:
+    """
+    Estrutura o texto com o LLM, reutilizando resultados anteriores do mesmo texto
+    
+    Consulta primeiro a memória (lru_cache) e depois PARSE_CACHE_DIR; só chama
+    o LLM se o texto nunca foi estruturado. Falhas não são armazenadas.
+    
+    Args:
+        text_hash: SHA-256 (hex) do texto, usado como chave do cache
+        text: Texto extraído do OCR
+    
+    Returns:
+        JSON estruturado serializado
+    
+    Raises:
+        ValueError: Se o LLM não conseguir estruturar o texto
+    """
+    cache_file = PARSE_CACHE_DIR / f"{text_hash}.json"
+    try:
+        return cache_file.read_text(encoding='utf-8')
+    except FileNotFoundError:
+        pass
+    
+    json_data = parse_ocr_text(text)
+    if not json_data:
+        raise ValueError("Falha na estruturação do texto")
+    
+    serialized = json.dumps(json_data, ensure_ascii=False)
+    try:
+        PARSE_CACHE_DIR.mkdir(exist_ok=True)
+        # Gravar em arquivo temporário e renomear para não deixar cache parcial
+        tmp_file = cache_file.with_name(f"{cache_file.name}.{threading.get_ident()}.tmp")
+        tmp_file.write_text(serialized, encoding='utf-8')
+        os.replace(tmp_file, cache_file)
+    except Exception as e:
+        logger.warning(f"⚠️ Erro ao gravar cache de estruturação: {e}")
+    return serialized
+
+
 def parse_text_to_json(text: str) -> Optional[Dict[str, Any]]:
     """
     Converte texto extraído em JSON estruturado usando o módulo parser
@@ -340,8 +513,12 @@ def parse_text_to_json(text: str) -> Optional[Dict[str, Any]]:
     logger.info("🧠 Estruturando texto com LLM usando parser module...")
     
     try:
-        # Usar o novo módulo de parsing
-        json_data = parse_ocr_text(text)
+        # Usar o novo módulo de parsing (textos já estruturados vêm do cache)
+        text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        try:
+            json_data = json.loads(_parse_cached(text_hash, text))
+        except ValueError:
+            json_data = None
         
         if json_data:
             logger.info("✅ Texto estruturado com sucesso em JSON")
@@ -377,11 +554,11 @@ def save_json_data(json_data: Dict[str, Any], image_path: Path) -> Path:
         with open(json_path, 'w', encoding='utf-8') as f:
             json.dump(json_data, f, indent=2, ensure_ascii=False)
         
-        print(f"💾 JSON salvo: {json_path}")
+        logger.debug("💾 JSON salvo: %s", json_path)
         return json_path
         
     except Exception as e:
-        print(f"❌ Erro ao salvar JSON: {e}")
+        logger.error("❌ Erro ao salvar JSON: %s", e)
         raise
 
 
@@ -402,20 +579,21 @@ def save_text_data(text: str, image_path: Path) -> Path:
         with open(text_path, 'w', encoding='utf-8') as f:
             f.write(text)
         
-        print(f"📄 Texto salvo: {text_path}")
+        logger.debug("📄 Texto salvo: %s", text_path)
         return text_path
         
     except Exception as e:
-        print(f"❌ Erro ao salvar texto: {e}")
+        logger.error("❌ Erro ao salvar texto: %s", e)
         raise
 
 
-def index_in_chromadb(json_data: Dict[str, Any]) -> bool:
+def index_in_chromadb(json_data: Dict[str, Any], chroma_dir: Optional[Path] = None) -> bool:
     """
     Indexa dados no ChromaDB para busca semântica
     
     Args:
         json_data: Dados estruturados
+        chroma_dir: Diretório do ChromaDB (padrão: CHROMA_DB_DIR)
     
     Returns:
         True se indexação foi bem-sucedida
@@ -424,7 +602,7 @@ def index_in_chromadb(json_data: Dict[str, Any]) -> bool:
     
     try:
         # Usar o caminho customizado do ChromaDB
-        success = index_note_in_chroma(json_data, persist_directory=str(CHROMA_DB_DIR))
+        success = index_note_in_chroma(json_data, persist_directory=str(chroma_dir or CHROMA_DB_DIR))
         if success:
             logger.info("✅ Dados indexados no ChromaDB com sucesso")
         else:
@@ -436,6 +614,33 @@ def index_in_chromadb(json_data: Dict[str, Any]) -> bool:
         return False
 
 
+def index_batch_in_chromadb(json_list: List[Dict[str, Any]], chroma_dir: Optional[Path] = None) -> List[bool]:
+    """
+    Indexa várias notas no ChromaDB com uma única geração de embeddings e gravação
+    
+    Args:
+        json_list: Dados estruturados das notas
+        chroma_dir: Diretório do ChromaDB (padrão: CHROMA_DB_DIR)
+    
+    Returns:
+        Resultado da indexação de cada nota, na mesma ordem da entrada
+    """
+    logger.info(f"🧠 Indexando {len(json_list)} nota(s) no ChromaDB...")
+    
+    try:
+        status = index_notes_in_chroma(json_list, persist_directory=str(chroma_dir or CHROMA_DB_DIR))
+        failed = status.count(False)
+        if failed:
+            logger.warning(f"⚠️ Falha na indexação de {failed} nota(s) no ChromaDB")
+        else:
+            logger.info("✅ Dados indexados no ChromaDB com sucesso")
+        return status
+        
+    except Exception as e:
+        logger.error(f"❌ Erro na indexação ChromaDB: {e}")
+        return [False] * len(json_list)
+
+
 def move_processed_image(image_path: Path) -> bool:
     """
     Move imagem processada para o diretório processed/
@@ -448,29 +653,33 @@ def move_processed_image(image_path: Path) -> bool:
     """
     try:
         processed_path = PROCESSED_DIR / image_path.name
-        shutil.move(str(image_path), str(processed_path))
-        print(f"📁 Imagem movida para: {processed_path}")
+        _fast_move(image_path, processed_path)
+        logger.debug("📁 Imagem movida para: %s", processed_path)
         return True
         
     except Exception as e:
-        print(f"❌ Erro ao mover imagem: {e}")
+        logger.error("❌ Erro ao mover imagem: %s", e)
         return False
 
 
-def process_single_image(image_path: Path, note_id: str = None) -> Dict[str, bool]:
+def process_single_image(image_path: Path, note_id: str = None, chroma_dir: Optional[Path] = None,
+                         index_now: bool = True) -> Dict[str, Any]:
     """
     Processa uma única imagem através de todo o pipeline
     
+    Pode ser executada em paralelo: não altera estado global do módulo.
+    
     Args:
         image_path: Caminho da imagem
         note_id: ID da nota (opcional)
+        chroma_dir: Diretório do ChromaDB (padrão: CHROMA_DB_DIR)
+        index_now: Se False, não indexa no ChromaDB; o JSON estruturado é
+            devolvido em results['json_data'] para indexação em lote
     
     Returns:
         Dicionário com status de cada etapa
     """
-    print(f"\n{'='*60}")
-    print(f"🔄 Processando imagem: {image_path.name}")
-    print(f"{'='*60}")
+    logger.info("🔄 Processando imagem: %s", image_path.name)
     
     results = {
         'ocr': False,
@@ -492,22 +701,24 @@ def process_single_image(image_path: Path, note_id: str = None) -> Dict[str, boo
             save_json_data(json_data, image_path)
             results['json_parsing'] = True
             
-            # Etapa 3: Indexar no ChromaDB
-            if index_in_chromadb(json_data):
+            # Etapa 3: Indexar no ChromaDB (ou deixar para o lote do pipeline)
+            if not index_now:
+                results['json_data'] = json_data
+            elif index_in_chromadb(json_data, chroma_dir):
                 results['chromadb'] = True
         else:
             # Fallback: salvar como texto puro
             save_text_data(extracted_text, image_path)
-            print("💾 Conteúdo salvo como texto puro")
+            logger.info("💾 Conteúdo salvo como texto puro")
         
         # Etapa 4: Mover imagem processada
         if move_processed_image(image_path):
             results['move_image'] = True
         
-        print(f"✅ Processamento de {image_path.name} concluído")
+        logger.info("✅ Processamento de %s concluído", image_path.name)
         
     except Exception as e:
-        print(f"❌ Erro no processamento de {image_path.name}: {e}")
+        logger.error("❌ Erro no processamento de %s: %s", image_path.name, e)
     
     return results
 
@@ -543,7 +754,8 @@ def run_pipeline(label_name: Optional[str] = None):
         keep = connect_to_keep()
         
         # Etapa 3: Buscar novas notas com imagens
-        new_notes = get_new_notes_with_images(keep, label_name)
+        pipeline_label = get_pipeline_label(label_name)
+        new_notes = get_new_notes_with_images(keep, label_name, pipeline_label)
         
         if not new_notes:
             print("ℹ️ Nenhuma nota nova para processar")
@@ -555,48 +767,79 @@ def run_pipeline(label_name: Optional[str] = None):
         failed_notes = 0
         total_images = 0
         processed_images = 0
-        
-        pipeline_label = f"main_pipeline_{label_name}" if label_name else "main_pipeline"
-        
-        # Processar cada nota
-        for note_idx, note in enumerate(new_notes, 1):
-            print(f"\n{'='*60}")
-            print(f"📝 Processando nota {note_idx}/{total_notes}")
-            print(f"📋 Título: {note.title or 'Sem título'}")
-            print(f"🆔 ID: {note.id[:8]}...")
-            print(f"{'='*60}")
+        indexed_images = 0
+        
+        # Downloads e OCR em paralelo: cada imagem segue para o OCR assim que
+        # termina de baixar, enquanto os demais anexos continuam sendo baixados
+        ocr_futures: Dict[str, List[Future]] = {note.id: [] for note in new_notes}
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as download_executor, \
+                ThreadPoolExecutor(max_workers=OCR_WORKERS) as ocr_executor:
+            download_futures = {}
+            for note in new_notes:
+                for future in submit_note_image_downloads(keep, note, download_executor):
+                    download_futures[future] = note
+            
+            for future in as_completed(download_futures):
+                note = download_futures[future]
+                image_path = future.result()
+                if image_path:
+                    total_images += 1
+                    ocr_futures[note.id].append(
+                        ocr_executor.submit(process_single_image, image_path, note.id, chroma_path, index_now=False)
+                    )
+            
+            # Notas estruturadas aguardando indexação em lote no ChromaDB
+            pending_index: List[Dict[str, Any]] = []
+            
+            def flush_index():
+                nonlocal indexed_images
+                if not pending_index:
+                    return
+                status = index_batch_in_chromadb([item['json_data'] for item in pending_index], chroma_path)
+                for item, indexed in zip(pending_index, status):
+                    item['chromadb'] = indexed
+                indexed_images += sum(status)
+                pending_index.clear()
             
             try:
-                # Baixar imagens da nota
-                images = download_note_images(keep, note)
-                total_images += len(images)
-                
-                if not images:
-                    print("⚠️ Nenhuma imagem baixada desta nota")
-                    continue
-                
-                # Processar cada imagem
-                note_success = True
-                for image_path in images:
-                    results = process_single_image(image_path, note.id)
+                # Consolidar resultados por nota
+                for note_idx, note in enumerate(new_notes, 1):
+                    logger.info("📝 Resultado da nota %d/%d: %s (%s...)",
+                                note_idx, total_notes, note.title or 'Sem título', note.id[:8])
                     
-                    # Verificar se pelo menos OCR funcionou
-                    if results['ocr']:
-                        processed_images += 1
-                    else:
-                        note_success = False
-                
-                # Marcar nota como processada se pelo menos uma imagem foi processada
-                if note_success and processed_images > 0:
-                    save_processed_note(note.id, pipeline_label)
-                    processed_notes += 1
-                else:
-                    failed_notes += 1
+                    if not ocr_futures[note.id]:
+                        logger.warning("⚠️ Nenhuma imagem baixada desta nota")
+                        continue
                     
-            except Exception as e:
-                print(f"❌ Erro ao processar nota {note.title or 'sem título'}: {e}")
-                failed_notes += 1
-                continue
+                    note_success = True
+                    for future in ocr_futures[note.id]:
+                        try:
+                            results = future.result()
+                        except Exception as e:
+                            logger.error("❌ Erro ao processar nota %s: %s", note.title or 'sem título', e)
+                            results = {'ocr': False}
+                        
+                        # Verificar se pelo menos OCR funcionou
+                        if results['ocr']:
+                            processed_images += 1
+                        else:
+                            note_success = False
+                        
+                        # Acumular para indexação em lote
+                        if results.get('json_data'):
+                            pending_index.append(results)
+                            if len(pending_index) >= INDEX_BATCH_SIZE:
+                                flush_index()
+                    
+                    # Marcar nota como processada se pelo menos uma imagem foi processada
+                    if note_success and processed_images > 0:
+                        save_processed_note(note.id, pipeline_label)
+                        processed_notes += 1
+                    else:
+                        failed_notes += 1
+            finally:
+                # Indexar o que restou (mesmo se o pipeline for interrompido)
+                flush_index()
         
         # Resumo final
         end_time = datetime.now()
@@ -610,6 +853,7 @@ def run_pipeline(label_name: Optional[str] = None):
         print(f"   📝 Notas processadas: {processed_notes}/{total_notes}")
         print(f"   ❌ Notas com falha: {failed_notes}")
         print(f"   🖼️ Imagens processadas: {processed_images}/{total_images}")
+        print(f"   🧠 Imagens indexadas: {indexed_images}/{processed_images}")
         print(f"📁 Diretórios:")
         print(f"   🖼️ Imagens processadas: {PROCESSED_DIR}")
         print(f"   🧠 ChromaDB: {CHROMA_DB_DIR}")
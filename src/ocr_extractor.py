@@ -6,8 +6,10 @@ OCR de Notas Manuscritas - Extrator de texto manuscrito usando OpenAI Vision API
 
 import openai
 import gkeepapi
+import argparse
 import base64
 import os
+import re
 import sys
 import time
 import getpass
@@ -15,81 +17,272 @@ import tempfile
 import shutil
 import requests
 import json
+import mimetypes
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
 from pathlib import Path
-from PIL import Image
+from types import MappingProxyType
+from typing import List, Optional, Tuple
 from datetime import datetime, timezone
 
+# Pillow só é necessário para reduzir imagens grandes antes do OCR (prepare_for_vision);
+# a validação dos anexos usa apenas a assinatura dos bytes (sniff_image_format)
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# orjson (opcional) acelera a leitura e a gravação de JSON; sem ele, usa a biblioteca padrão
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# pybase64 (opcional) tem codificador base64 vetorizado (SIMD), bem mais rápido
+# em imagens de vários MB; sem ele, usa a biblioteca padrão
+try:
+    import pybase64 as _base64
+except ImportError:
+    _base64 = base64
+
 # Importar ChromaIndexer para indexação semântica
 try:
-    from .chroma_indexer import index_note_in_chroma
+    from .chroma_indexer import index_note_in_chroma, index_notes_in_chroma
     CHROMA_AVAILABLE = True
 except ImportError:
     try:
         # Fallback para importação absoluta
-        from src.chroma_indexer import index_note_in_chroma
+        from src.chroma_indexer import index_note_in_chroma, index_notes_in_chroma
         CHROMA_AVAILABLE = True
     except ImportError:
         CHROMA_AVAILABLE = False
         print("⚠️ Aviso: ChromaIndexer não encontrado. A indexação semântica não estará disponível.")
 
 MODEL_NAME = "gpt-4o"  # modelo atual com suporte a visão
+VALID_IMAGE_EXTENSIONS = frozenset({'.png', '.jpg', '.jpeg', '.webp', '.gif'})  # formatos aceitos pela API de visão
+_JSON_FENCE_RE = re.compile(r'```(?:json)?\s*\n?(.*?)\n?```', re.DOTALL | re.IGNORECASE)  # JSON em bloco de código markdown
 IMAGE_DIR = Path(__file__).parent.parent / "image"  # Diretório para salvar imagens (raiz do projeto)
-PROCESSED_NOTES_FILE = Path(__file__).parent.parent / ".processed_notes.json"  # Arquivo para registro de notas processadas
+PROCESSED_NOTES_FILE = Path(__file__).parent.parent / ".processed_notes.jsonl"  # Registro append-only de notas processadas (compartilhado com main.py)
+LEGACY_PROCESSED_NOTES_FILE = Path(__file__).parent.parent / ".processed_notes.json"  # Formato antigo (apenas leitura)
+
+# Máximo de imagens enviadas em uma única requisição à API de visão (notas maiores são divididas)
+MAX_IMAGES_PER_REQUEST = 16
+
+# Instrução enviada junto com as imagens para transcrição e estruturação em JSON
+OCR_PROMPT = (
+    "Todo o texto utilizado para gerar o JSON deve ser extraido da imagem."
+    "A imagem contém texto manuscrito que deve ser transcrito e organizado."
+    "A transcrição deve ser feita de forma precisa e fiel ao conteúdo da imagem"
+    "caso alguma parte fique ilegivel, use a logica para completar a lacuna."
+    "Todo a imagem virá dividida em blocos de texto, tarefas, notas e lembretes."
+    "Organize o seguinte texto OCR em formato JSON com os campos:"
+    "title (Nota Diária)"
+    "Todas as partes devem vir encaixadas em algum dos campos definidos" 
+    "data (data encontrada no texto ou deixe vazio),"
+    "summary (resuma o conteúdo em uma frase),"
+    "keywords (até 5 palavras-chave relevantes),"
+    "tasks (lista de tarefas com status done ou todo),"
+    "notes (lista de anotações gerais),"
+    "reminders (lista de lembretes, coisas a lembrar ou não esquecer)."
+)
+
+# Imagens maiores que isso (lado, em pixels) são reduzidas antes do envio: a API de
+# visão redimensiona tudo para caber em 2048x2048, então pixels extras só custam banda
+VISION_MAX_SIDE = 2048
+VISION_JPEG_QUALITY = 85
+VISION_RECOMPRESS_MIN_BYTES = 512 * 1024  # imagens menores são enviadas como estão
+
+# Registro de notas processadas em memória (lido do disco uma vez, atualizado a cada gravação)
+_processed_notes_cache = None
 
 # Flag para controlar a indexação no ChromaDB
 ENABLE_CHROMA_INDEXING = True  # Por padrão, ativar indexação
 
+# Tentativas extras das chamadas à OpenAI em erros transitórios (429, 5xx, conexão).
+# O próprio SDK aplica backoff exponencial com jitter e respeita o Retry-After
+OPENAI_MAX_RETRIES = max(0, int(os.environ.get("KEEP_OPENAI_MAX_RETRIES", "5")))
+openai.max_retries = OPENAI_MAX_RETRIES
+
+# Número de chamadas simultâneas à API de visão (limitadas por rede; ajuste conforme o rate limit)
+OCR_WORKERS = max(1, int(os.environ.get("KEEP_OCR_WORKERS", "6")))
+
+# Número de anexos baixados em paralelo
+DOWNLOAD_WORKERS = max(1, int(os.environ.get("KEEP_DOWNLOAD_WORKERS", "8")))
+
+# Tempo máximo (segundos) de cada requisição de download de anexo
+HTTP_TIMEOUT = 30
+HTTP_MAX_RETRIES = 3  # novas tentativas por requisição em falhas transitórias
+
+# Tamanho dos blocos lidos da rede e gravados em disco durante o download
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def sniff_image_format(header: bytes) -> Optional[str]:
+    """
+    Identifica o formato da imagem pelos primeiros bytes do arquivo
+    
+    Args:
+        header: Primeiros bytes do arquivo (32 bastam)
+    
+    Returns:
+        "PNG", "JPEG", "GIF" ou "WEBP", ou None se não for um formato suportado
+        pela API de visão (não é preciso decodificar a imagem com PIL)
+    """
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return "PNG"
+    if header.startswith(b'\xff\xd8\xff'):
+        return "JPEG"
+    if header.startswith((b'GIF87a', b'GIF89a')):
+        return "GIF"
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return "WEBP"
+    return None
+
+
+def json_loads(content):
+    """Decodifica JSON (str ou bytes) com orjson, se disponível; erros são json.JSONDecodeError"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def write_json_file(data, path: Path):
+    """Grava JSON indentado (UTF-8, sem escapar acentos) usando orjson, se disponível"""
+    if ORJSON_AVAILABLE:
+        path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def b64encode_image(image_bytes: bytes) -> str:
+    """Codifica os bytes de uma imagem em base64 (texto ASCII para a data URL)"""
+    return _base64.b64encode(image_bytes).decode('ascii')
+
+
+def image_data_url(image_bytes: bytes, mime: str) -> str:
+    """
+    Monta a data URL (data:<mime>;base64,...) de uma imagem
+    
+    O base64 é acrescentado em bytes ao prefixo e decodificado uma única vez, sem
+    manter uma string base64 intermediária além da URL final.
+    """
+    data_url = bytearray(f"data:{mime};base64,".encode("ascii"))
+    data_url += _base64.b64encode(image_bytes)
+    return data_url.decode("ascii")
+
 
 def encode_image_to_base64(path):
     """Converte uma imagem para base64"""
     try:
-        return base64.b64encode(Path(path).read_bytes()).decode()
+        return b64encode_image(Path(path).read_bytes())
     except Exception as e:
         sys.exit(f"Erro ao processar a imagem: {e}")
 
 
-def transcribe_handwriting(image_path: str) -> str:
-    """Transcreve texto manuscrito de uma imagem usando a API OpenAI Vision"""
+def prepare_for_vision(image_bytes: bytes, mime: str) -> Tuple[bytes, str]:
+    """
+    Reduz e recomprime imagens grandes em JPEG antes do envio à API de visão
+    
+    Args:
+        image_bytes: Conteúdo original da imagem
+        mime: Tipo MIME original
+    
+    Returns:
+        Tupla (bytes, tipo MIME) a enviar; a imagem original é mantida se já for
+        pequena, se a recompressão não reduzir o tamanho, se falhar ou se o
+        Pillow não estiver instalado
+    """
+    if not PIL_AVAILABLE or len(image_bytes) <= VISION_RECOMPRESS_MIN_BYTES:
+        return image_bytes, mime
+    
+    try:
+        with Image.open(BytesIO(image_bytes)) as img:
+            img.thumbnail((VISION_MAX_SIDE, VISION_MAX_SIDE), Image.LANCZOS)
+            if img.mode in ("RGBA", "LA", "P"):
+                # Transparência vira fundo branco (o JPEG não tem canal alfa)
+                rgba = img.convert("RGBA")
+                img = Image.new("RGB", rgba.size, (255, 255, 255))
+                img.paste(rgba, mask=rgba.getchannel("A"))
+            elif img.mode != "RGB":
+                img = img.convert("RGB")
+            
+            buffer = BytesIO()
+            img.save(buffer, "JPEG", quality=VISION_JPEG_QUALITY)
+    except Exception as e:
+        print(f"⚠️ Não foi possível reduzir a imagem, enviando original: {e}")
+        return image_bytes, mime
+    
+    if buffer.tell() >= len(image_bytes):
+        return image_bytes, mime
+    return buffer.getvalue(), "image/jpeg"
+
+
+def transcribe_handwriting(image_path: str = None, image_bytes: bytes = None, mime: str = None) -> str:
+    """
+    Transcreve texto manuscrito de uma imagem usando a API OpenAI Vision
+    
+    Args:
+        image_path: Caminho da imagem (usado para leitura e validação da extensão)
+        image_bytes: Conteúdo da imagem já carregado; se informado, o arquivo não é lido novamente
+        mime: Tipo MIME da imagem; se omitido, é detectado pelos primeiros bytes
+    """
     # Verificar extensão da imagem
-    valid_extensions = ['.png', '.jpg', '.jpeg']
-    if Path(image_path).suffix.lower() not in valid_extensions:
-        sys.exit(f"Extensão não suportada. Use: {', '.join(valid_extensions)}")
+    if image_path is not None and Path(image_path).suffix.casefold() not in VALID_IMAGE_EXTENSIONS:
+        sys.exit(f"Extensão não suportada. Use: {', '.join(sorted(VALID_IMAGE_EXTENSIONS))}")
+    if image_path is None and image_bytes is None:
+        sys.exit("Informe image_path ou image_bytes")
+    
+    if image_bytes is None:
+        try:
+            image_bytes = Path(image_path).read_bytes()
+        except Exception as e:
+            sys.exit(f"Erro ao processar a imagem: {e}")
+    
+    if mime is None:
+        # Assinatura dos bytes primeiro; a extensão do arquivo só como alternativa
+        img_format = sniff_image_format(image_bytes[:32])
+        if img_format:
+            mime = f"image/{img_format.lower()}"
+        else:
+            mime = (image_path and mimetypes.guess_type(str(image_path))[0]) or "image/png"
+    
+    return transcribe_handwriting_multi([image_data_url(*prepare_for_vision(image_bytes, mime))])
+
+
+def transcribe_handwriting_multi(image_urls: List[str]) -> str:
+    """
+    Transcreve várias imagens da mesma nota em uma única chamada à API OpenAI Vision
+    
+    Args:
+        image_urls: Data URLs das imagens (ver image_data_url), no máximo
+            MAX_IMAGES_PER_REQUEST; todas são tratadas como páginas da mesma nota
+    
+    Returns:
+        Transcrição consolidada (um único JSON para todas as imagens)
+    """
+    prompt = OCR_PROMPT
+    if len(image_urls) > 1:
+        prompt += (
+            f" As {len(image_urls)} imagens são páginas da mesma nota, na ordem enviada;"
+            " gere um único JSON consolidado com o conteúdo de todas elas."
+        )
+    
+    content = [{"type": "text", "text": prompt}]
+    content.extend(
+        {"type": "image_url", "image_url": {"url": url, "detail": "high"}}
+        for url in image_urls
+    )
     
     try:
-        base64_img = encode_image_to_base64(image_path)
-        
         response = openai.chat.completions.create(
             model=MODEL_NAME,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": (
-                                "Todo o texto utilizado para gerar o JSON deve ser extraido da imagem."
-                                "A imagem contém texto manuscrito que deve ser transcrito e organizado."
-                                "A transcrição deve ser feita de forma precisa e fiel ao conteúdo da imagem"
-                                "caso alguma parte fique ilegivel, use a logica para completar a lacuna."
-                                "Todo a imagem virá dividida em blocos de texto, tarefas, notas e lembretes."
-                                "Organize o seguinte texto OCR em formato JSON com os campos:"
-                                "title (Nota Diária)"
-                                "Todas as partes devem vir encaixadas em algum dos campos definidos" 
-                                "data (data encontrada no texto ou deixe vazio),"
-                                "summary (resuma o conteúdo em uma frase),"
-                                "keywords (até 5 palavras-chave relevantes),"
-                                "tasks (lista de tarefas com status done ou todo),"
-                                "notes (lista de anotações gerais),"
-                                "reminders (lista de lembretes, coisas a lembrar ou não esquecer)."
-                            )
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {"url": f"data:image/png;base64,{base64_img}"}
-                        }
-                    ],
-                }
-            ],
+            messages=[{"role": "user", "content": content}],
         )
         return response.choices[0].message.content.strip()
     except openai.OpenAIError as e:
@@ -98,6 +291,80 @@ def transcribe_handwriting(image_path: str) -> str:
         sys.exit(f"Erro ao transcrever texto: {e}")
 
 
+def transcribe_note_images(images: List[Tuple[bytes, str]]) -> str:
+    """
+    Transcreve em uma única requisição as imagens (bytes, tipo MIME) de uma nota
+    
+    A redução das imagens e a codificação base64 acontecem aqui para rodar na thread de OCR;
+    cada imagem reduzida é descartada assim que sua data URL é montada.
+    """
+    return transcribe_handwriting_multi([
+        image_data_url(*prepare_for_vision(img_bytes, mime)) for img_bytes, mime in images
+    ])
+
+
+def persist_transcription(texto: str, out_base: Path, pending_index: Optional[List[dict]] = None) -> bool:
+    """
+    Salva a transcrição ao lado da imagem e indexa no ChromaDB quando for JSON
+    
+    Args:
+        texto: Resposta da API de visão (JSON, opcionalmente em bloco de código markdown)
+        out_base: Caminho base do arquivo de saída (a extensão é trocada por .json ou .txt)
+        pending_index: Se informado, o JSON é acumulado nesta lista para indexação
+            em lote (flush_chroma_index) em vez de ser indexado imediatamente
+    
+    Returns:
+        True se o arquivo de saída foi salvo
+    """
+    try:
+        # Tentar extrair JSON de markdown code blocks primeiro; senão, usar o texto inteiro
+        json_match = _JSON_FENCE_RE.search(texto)
+        json_content = json_match.group(1).strip() if json_match else texto.strip()
+        
+        try:
+            json_data = json_loads(json_content)
+        except json.JSONDecodeError:
+            # Não é JSON válido, salvar como .txt
+            out_file = out_base.with_suffix(".txt")
+            out_file.write_text(texto, encoding="utf-8")
+            print(f"✅ Transcrição salva em: {out_file}")
+            return True
+        
+        # É JSON válido, salvar como .json
+        out_file = out_base.with_suffix(".json")
+        write_json_file(json_data, out_file)
+        print(f"✅ JSON estruturado salvo em: {out_file}")
+        
+        # Indexar no ChromaDB para busca semântica
+        if CHROMA_AVAILABLE and ENABLE_CHROMA_INDEXING and pending_index is not None:
+            pending_index.append(json_data)
+        elif CHROMA_AVAILABLE and ENABLE_CHROMA_INDEXING:
+            print("🔄 Indexando no ChromaDB para busca semântica...")
+            if index_note_in_chroma(json_data):
+                print("✅ Nota indexada com sucesso no ChromaDB!")
+            else:
+                print("⚠️ Falha na indexação no ChromaDB")
+        return True
+    except Exception as e:
+        print(f"❌ Erro ao salvar o arquivo de saída: {e}")
+        return False
+
+
+def flush_chroma_index(pending_index: List[dict]):
+    """Indexa no ChromaDB, em um único lote, as notas acumuladas e esvazia a lista"""
+    if not pending_index:
+        return
+    
+    print(f"\n🔄 Indexando {len(pending_index)} notas no ChromaDB para busca semântica...")
+    status = index_notes_in_chroma(pending_index)
+    indexed = sum(status)
+    if indexed == len(status):
+        print(f"✅ {indexed} notas indexadas com sucesso no ChromaDB!")
+    else:
+        print(f"⚠️ Falha na indexação de {len(status) - indexed} de {len(status)} notas no ChromaDB")
+    pending_index.clear()
+
+
 def process_single_image(img_path):
     """Processa uma única imagem local (funcionalidade original)"""
     if not Path(img_path).is_file():
@@ -112,79 +379,61 @@ def process_single_image(img_path):
     print("-" * 50)
     
     # Salvar transcrição em arquivo
-    try:
-        # Detectar se o conteúdo é JSON válido
-        json_data = None
-        json_content = None
-        
-        # Tentar extrair JSON de markdown code blocks primeiro
-        import re
-        json_match = re.search(r'```(?:json)?\s*\n?(.*?)\n?```', texto, re.DOTALL | re.IGNORECASE)
-        if json_match:
-            json_content = json_match.group(1).strip()
-        else:
-            # Se não há code blocks, tentar o texto inteiro
-            json_content = texto.strip()
-        
-        try:
-            json_data = json.loads(json_content)
-            # É JSON válido, salvar como .json
-            out_file = Path(img_path).with_suffix(".json")
-            with open(out_file, "w", encoding="utf-8") as f:
-                json.dump(json_data, f, indent=2, ensure_ascii=False)
-            print(f"✅ JSON estruturado salvo em {out_file}")
-            
-            # Indexar no ChromaDB para busca semântica
-            if CHROMA_AVAILABLE and ENABLE_CHROMA_INDEXING:
-                print("🔄 Indexando no ChromaDB para busca semântica...")
-                if index_note_in_chroma(json_data):
-                    print("✅ Nota indexada com sucesso no ChromaDB!")
-                else:
-                    print("⚠️ Falha na indexação no ChromaDB")
-                
-        except json.JSONDecodeError:
-            # Não é JSON válido, salvar como .txt
-            out_file = Path(img_path).with_suffix(".txt")
-            out_file.write_text(texto, encoding="utf-8")
-            print(f"✅ Transcrição salva em {out_file}")
-    except Exception as e:
-        print(f"❌ Erro ao salvar o arquivo de saída: {e}")
+    persist_transcription(texto, Path(img_path))
+
+
+def parse_args(argv=None):
+    """Lê os argumentos de linha de comando"""
+    parser = argparse.ArgumentParser(
+        prog="ocr_extractor.py",
+        description="📋 OCR de Notas Manuscritas",
+        epilog=(
+            "exemplos:\n"
+            "  python ocr_extractor.py                     # Processar imagem padrão\n"
+            "  python ocr_extractor.py imagem.png          # Processar imagem específica\n"
+            "  python ocr_extractor.py MinhaLabel          # Processar notas do Google Keep com esta label"
+        ),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("target", nargs="?",
+                        help="Caminho de uma imagem local ou label do Google Keep (padrão: imagem de exemplo)")
+    parser.add_argument("--no-index", "--disable-indexing", dest="no_index", action="store_true",
+                        help="Desativar indexação no ChromaDB")
+    return parser.parse_args(argv)
+
+
+def is_keep_label(target):
+    """
+    Indica se o alvo da linha de comando deve ser tratado como label do Google Keep
+    
+    Arquivos existentes, caminhos absolutos e nomes com extensão de imagem são
+    tratados como imagem local (mesmo que não existam, para não ir à rede por engano).
+    """
+    if target is None:
+        return False
+    target_path = Path(target)
+    return not (target_path.is_file() or target_path.is_absolute()
+                or target_path.suffix.casefold() in VALID_IMAGE_EXTENSIONS)
 
 
-def main():
+def main(args=None):
     """Função principal do programa"""
-    # Verificar argumentos
-    if len(sys.argv) == 1:
+    if args is None:
+        args = parse_args()
+    
+    if args.target is None:
         # Modo local - usar a imagem padrão
         img_path = Path(__file__).parent / "image" / "ink.png"
         print(f"🖼️ Modo Local: Usando imagem padrão: {img_path}")
         process_single_image(str(img_path))
-    elif len(sys.argv) == 2 and sys.argv[1] == "--help":
-        # Exibir ajuda
-        print("\n📋 Uso do OCR de Notas Manuscritas:")
-        print("  python ocr_extractor.py                     # Processar imagem padrão")
-        print("  python ocr_extractor.py imagem.png          # Processar imagem específica")
-        print("  python ocr_extractor.py MinhaLabel          # Processar notas do Google Keep com esta label")
-        print("\nOpções:")
-        print("  --no-index, --disable-indexing              # Desativar indexação no ChromaDB")
-        print("  --help                                      # Exibir esta ajuda")
-        sys.exit(0)
-    elif len(sys.argv) == 2 and (Path(sys.argv[1]).is_file() or sys.argv[1].startswith("/")):
-        # Modo local - imagem específica
-        print(f"🖼️ Modo Local: Processando imagem específica: {sys.argv[1]}")
-        process_single_image(sys.argv[1])
-    elif len(sys.argv) == 2:
+    elif is_keep_label(args.target):
         # Modo Google Keep - processar notas com a label especificada
-        print(f"🔄 Modo Google Keep: Buscando notas com a label '{sys.argv[1]}'")
-        process_keep_notes(sys.argv[1])
+        print(f"🔄 Modo Google Keep: Buscando notas com a label '{args.target}'")
+        process_keep_notes(args.target)
     else:
-        sys.exit("📋 Uso:\n"
-                 "1. Para processar uma imagem local com a imagem padrão:\n"
-                 "   python ocr_extractor.py\n\n"
-                 "2. Para processar uma imagem local específica:\n"
-                 "   python ocr_extractor.py caminho/para/sua/imagem.png\n\n"
-                 "3. Para processar notas do Google Keep com uma label específica:\n"
-                 "   python ocr_extractor.py MinhaLabel")
+        # Modo local - imagem específica
+        print(f"🖼️ Modo Local: Processando imagem específica: {args.target}")
+        process_single_image(args.target)
 
 
 def connect_to_keep():
@@ -219,19 +468,26 @@ def connect_to_keep():
                 "4. Configure suas credenciais no arquivo .env/config")
 
 
+@lru_cache(maxsize=1)
 def load_keep_credentials():
-    """Carrega as credenciais do Google Keep do arquivo de configuração"""
+    """
+    Carrega as credenciais do Google Keep do arquivo de configuração
+
+    O arquivo é lido apenas uma vez por processo; chamadas seguintes retornam
+    o mesmo mapeamento (somente leitura). Use load_keep_credentials.cache_clear()
+    após alterar o arquivo.
+    """
     env_file = Path(__file__).parent.parent / '.env' / 'config'
     config = {}
     
     if env_file.exists():
         try:
-            with open(env_file, 'r') as f:
-                for line in f:
-                    if line.strip() and not line.startswith('#'):
-                        if '=' in line:
-                            key, value = line.strip().split('=', 1)
-                            config[key] = value
+            # Uma única leitura e uma passada sobre as linhas CHAVE=valor
+            config = dict(
+                line.strip().split('=', 1)
+                for line in env_file.read_text(encoding='utf-8').splitlines()
+                if line.strip() and not line.startswith('#') and '=' in line
+            )
         except Exception as e:
             print(f"Aviso: Não foi possível ler o arquivo de configuração: {e}")
     
@@ -241,7 +497,7 @@ def load_keep_credentials():
         print("Por motivos de segurança, recomendamos atualizar para usar o master token.")
         print("Veja as instruções em CONFIG.md sobre como obter e configurar o master token.\n")
     
-    return config
+    return MappingProxyType(config)
 
 
 def save_keep_credentials(email, master_token=None):
@@ -253,7 +509,7 @@ def save_keep_credentials(email, master_token=None):
     if not env_dir.exists():
         env_dir.mkdir()
     
-    config = load_keep_credentials() or {}
+    config = dict(load_keep_credentials())
     config['GOOGLE_EMAIL'] = email
     
     # Salvar master token apenas se fornecido
@@ -273,10 +529,55 @@ def save_keep_credentials(email, master_token=None):
                 f.write(f"{key}={value}\n")
     except Exception as e:
         print(f"Aviso: Não foi possível salvar o arquivo de configuração: {e}")
+    finally:
+        # Invalidar cache para que a próxima leitura reflita o arquivo salvo
+        load_keep_credentials.cache_clear()
+
+
+@lru_cache(maxsize=1)
+def get_http_session():
+    """
+    Retorna a sessão HTTP compartilhada pelos downloads de anexos
+
+    Reutilizar a mesma sessão mantém as conexões TCP/TLS abertas (keep-alive)
+    entre os anexos e entre as estratégias de fallback de download_blob. O pool
+    comporta todos os downloads simultâneos, e falhas transitórias (conexão,
+    429, 5xx) são repetidas com backoff antes de passar à próxima estratégia.
+    """
+    retry = Retry(
+        total=HTTP_MAX_RETRIES,
+        backoff_factor=0.3,
+        status_forcelist=(429, 500, 502, 503, 504),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=max(DOWNLOAD_WORKERS, 10), max_retries=retry)
+    
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
 
 def download_blob(blob, note_title, index, keep_instance=None):
     """Baixa qualquer tipo de blob (anexo) de uma nota do Google Keep com método simplificado"""
+    downloaded = download_blob_bytes(blob, note_title, index, keep_instance)
+    return downloaded[0] if downloaded else None
+
+
+def download_blob_bytes(blob, note_title, index, keep_instance=None):
+    """
+    Baixa um blob (anexo) de uma nota do Google Keep, salva em disco e mantém o conteúdo em memória
+    
+    Args:
+        blob: Anexo da nota do Google Keep
+        note_title: Título da nota (usado no nome do arquivo)
+        index: Posição do anexo na nota
+        keep_instance: Cliente do Google Keep (usa a variável global se omitido)
+    
+    Returns:
+        Tupla (caminho do arquivo, bytes baixados, Content-Type informado pelo servidor ou None),
+        ou None se todas as estratégias de download falharem
+    """
     # Usar o keep_instance passado ou a variável global
     if keep_instance:
         keep_client = keep_instance
@@ -302,7 +603,6 @@ def download_blob(blob, note_title, index, keep_instance=None):
         blob_id = blob.server_id[:8]
     
     # Timestamp para garantir unicidade
-    from datetime import datetime
     timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
     
     # Nome do arquivo: titulo_timestamp_id_index.png
@@ -314,19 +614,57 @@ def download_blob(blob, note_title, index, keep_instance=None):
     file_path = IMAGE_DIR / file_name
     print(f"🏷️ Nome do arquivo: {file_name}")
     
-    # Método Único: implementa estratégia de fallback em um único método
+    data, content_type = fetch_blob_bytes(blob, keep_client, file_path)
+    if not data:
+        print("❌ Todas as estratégias de download falharam")
+        return None
     
+    return file_path, data, content_type
+
+
+def stream_to_file(url, file_path):
+    """
+    Baixa uma URL em blocos, gravando no arquivo enquanto acumula o conteúdo
+    
+    Evita o buffer intermediário de response.content: o pico de memória é o
+    tamanho do anexo (mais um bloco), não o dobro.
+    
+    Returns:
+        Tupla (bytearray com o conteúdo, Content-Type ou None), ou None se a
+        resposta não for 200 ou vier vazia
+    """
+    with get_http_session().get(url, timeout=HTTP_TIMEOUT, stream=True) as response:
+        if response.status_code != 200:
+            return None
+        
+        data = bytearray()
+        with open(file_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+                data += chunk
+        
+        if not data:
+            file_path.unlink(missing_ok=True)
+            return None
+        return data, response.headers.get('Content-Type')
+
+
+def fetch_blob_bytes(blob, keep_client, file_path):
+    """
+    Obtém o conteúdo de um blob tentando as estratégias de download em ordem e o salva em file_path
+    
+    Returns:
+        Tupla (bytes, Content-Type ou None); (None, None) se nenhuma estratégia funcionar
+    """
     # Estratégia 1: Usar getMediaLink (método oficial e preferido)
     try:
         print("🔄 Tentando download via getMediaLink (método principal)...")
         media_url = keep_client.getMediaLink(blob)
         if media_url:
-            response = requests.get(media_url)
-            if response.status_code == 200:
-                with open(file_path, 'wb') as f:
-                    f.write(response.content)
+            downloaded = stream_to_file(media_url, file_path)
+            if downloaded:
                 print(f"✅ Imagem salva com sucesso via getMediaLink")
-                return file_path
+                return downloaded
     except Exception as e:
         print(f"ℹ️ getMediaLink falhou: {e}")
     
@@ -340,10 +678,9 @@ def download_blob(blob, note_title, index, keep_instance=None):
             binary_data = blob.drawable.getBytes()
         
         if binary_data:
-            with open(file_path, 'wb') as f:
-                f.write(binary_data)
+            file_path.write_bytes(binary_data)
             print(f"✅ Imagem salva com sucesso via dados binários")
-            return file_path
+            return binary_data, None
     except Exception as e:
         print(f"ℹ️ Acesso a dados binários falhou: {e}")
     
@@ -353,22 +690,57 @@ def download_blob(blob, note_title, index, keep_instance=None):
             print("🔄 Tentando URL direta baseada no server_id...")
             server_id = blob.server_id
             api_url = f"https://keep.google.com/media/v2/{server_id}"
-            response = requests.get(api_url)
-            if response.status_code == 200:
-                with open(file_path, 'wb') as f:
-                    f.write(response.content)
+            downloaded = stream_to_file(api_url, file_path)
+            if downloaded:
                 print(f"✅ Imagem salva com sucesso via URL direta")
-                return file_path
+                return downloaded
     except Exception as e:
         print(f"ℹ️ URL direta falhou: {e}")
     
-    print("❌ Todas as estratégias de download falharam")
-    return None
+    return None, None
 
 
 # A função extract_drawing foi integrada ao download_blob para simplificar o código
 
 
+def fetch_note_image(blob, note_title, index):
+    """
+    Baixa um anexo de nota e confirma que é uma imagem suportada pela API de visão
+    
+    Args:
+        blob: Anexo da nota do Google Keep
+        note_title: Título da nota (usado no nome do arquivo)
+        index: Posição do anexo na nota
+    
+    Returns:
+        Tupla (caminho da imagem salva, bytes da imagem, tipo MIME), ou None se o
+        download ou a validação falharem. Os bytes seguem direto para o OCR, sem
+        reler o arquivo nem decodificar a imagem.
+    """
+    try:
+        print("🔄 Baixando anexo...")
+        downloaded = download_blob_bytes(blob, note_title, index)
+        if not downloaded:
+            print("❌ Não foi possível baixar o anexo")
+            return None
+        img_path, img_bytes, content_type = downloaded
+        print(f"💾 Anexo salvo em: {img_path}")
+    except Exception as download_error:
+        print(f"⚠️ Erro ao baixar anexo: {download_error}")
+        print("❌ Falha ao baixar anexo")
+        debug_blob_info(blob)
+        return None
+    
+    # Verificar se é uma imagem válida pela assinatura dos primeiros bytes
+    img_format = sniff_image_format(img_bytes[:32])
+    if not img_format:
+        print(f"⚠️ O arquivo não é uma imagem válida (Content-Type: {content_type or 'desconhecido'})")
+        return None
+    print(f"✅ Imagem validada (Formato: {img_format})")
+    
+    return img_path, img_bytes, f"image/{img_format.lower()}"
+
+
 def process_keep_notes(label_name):
     """Processa notas do Google Keep com a label especificada e criadas hoje"""
     # Conectar ao Google Keep
@@ -440,116 +812,94 @@ def process_keep_notes(label_name):
     processed_count = 0
     skipped_count = 0
     
-    for note in notes_to_process:
-        print(f"\n{'=' * 50}")
-        print(f"📝 Nota: {note.title or 'Sem título'} (ID: {note.id[:8]})")
+    # Downloads e chamadas à API de visão são limitados por rede: todos os anexos
+    # são baixados em paralelo, o OCR das notas roda em paralelo e os resultados
+    # são consolidados na ordem original das notas
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as download_executor, \
+            ThreadPoolExecutor(max_workers=OCR_WORKERS) as ocr_executor:
+        pending_notes = []
+        download_futures = {}
         
-        # Verificar se a nota já foi processada (verificação extra)
-        if is_note_processed(note.id, label_name):
-            print("⏭️ Esta nota já foi processada anteriormente. Pulando...")
-            skipped_count += 1
-            continue
+        for note in notes_to_process:
+            print(f"\n{'=' * 50}")
+            print(f"📝 Nota: {note.title or 'Sem título'} (ID: {note.id[:8]})")
+            
+            # Verificar se a nota já foi processada (verificação extra)
+            if is_note_processed(note.id, label_name):
+                print("⏭️ Esta nota já foi processada anteriormente. Pulando...")
+                skipped_count += 1
+                continue
+                
+            print(f"{'=' * 50}")
+            
+            # Verificar se a nota tem anexos (blobs)
+            if not note.blobs:
+                print("ℹ️ Esta nota não contém anexos (imagens).")
+                continue
             
-        print(f"{'=' * 50}")
-        
-        # Verificar se a nota tem anexos (blobs)
-        if note.blobs:
             print(f"📎 Encontrados {len(note.blobs)} anexos.")
-            blobs_processed = False
+            downloads = []
+            pending_notes.append((note, downloads))
             
-            # Processar cada anexo
             for i, blob in enumerate(note.blobs):
-                try:
-                    print(f"\n🖼️ Processando anexo {i+1}...")
-                    
-                    # Caminho da imagem a ser processada
-                    img_path = None
-                    
-                    # Abordagem simplificada: tentar baixar o anexo
-                    try:
-                        print("🔄 Baixando anexo...")
-                        img_path = download_blob(blob, note.title or "sem_titulo", i)
-                        if img_path:
-                            print(f"💾 Anexo salvo em: {img_path}")
-                        else:
-                            print("❌ Não foi possível baixar o anexo")
-                            continue  # Passa para o próximo anexo
-                    except Exception as download_error:
-                        print(f"⚠️ Erro ao baixar anexo: {download_error}")
-                        print("❌ Falha ao baixar anexo")
-                        continue  # Passa para o próximo anexo
-                    
-                    # Verificar se é uma imagem válida
-                    if img_path:
-                        try:
-                            with Image.open(img_path) as img:
-                                img_format = img.format
-                                print(f"✅ Imagem validada (Formato: {img_format})")
-                        except Exception as img_error:
-                            print(f"⚠️ O arquivo não é uma imagem válida: {img_error}")
-                            continue
-                    
-                    # Transcrever o texto manuscrito
-                    print("🔍 Executando OCR com OpenAI Vision...")
-                    texto = transcribe_handwriting(str(img_path))
-                    
-                    # Exibir a transcrição
-                    print("\n📄 Transcrição:")
-                    print("-" * 50)
-                    print(texto)
-                    print("-" * 50)
-                    
-                    # Salvar a transcrição
+                future = download_executor.submit(fetch_note_image, blob, note.title or "sem_titulo", i)
+                downloads.append((i, blob, future))
+        
+        # Quando todos os anexos de uma nota terminam de baixar, as imagens seguem
+        # juntas para a API de visão: uma requisição por nota (em blocos de até
+        # MAX_IMAGES_PER_REQUEST imagens), em vez de uma por anexo
+        note_jobs = []
+        for note, downloads in pending_notes:
+            images = []
+            for i, blob, future in downloads:
+                fetched = future.result()
+                if fetched:
+                    images.append((i, blob, fetched))
+            
+            ocr_jobs = []
+            for start in range(0, len(images), MAX_IMAGES_PER_REQUEST):
+                chunk = images[start:start + MAX_IMAGES_PER_REQUEST]
+                payload = [(img_bytes, mime) for _, _, (_, img_bytes, mime) in chunk]
+                ocr_jobs.append((chunk, ocr_executor.submit(transcribe_note_images, payload)))
+            note_jobs.append((note, ocr_jobs))
+        
+        # Notas estruturadas aguardando indexação em lote no ChromaDB (gravadas
+        # mesmo se a execução for interrompida)
+        pending_index = []
+        try:
+            for note, ocr_jobs in note_jobs:
+                blobs_processed = False
+                
+                for chunk, future in ocr_jobs:
+                    # A transcrição consolidada é salva junto à primeira imagem do bloco
+                    img_path = chunk[0][2][0]
+                    anexos = ", ".join(str(i + 1) for i, _, _ in chunk)
                     try:
-                        # Detectar se o conteúdo é JSON válido
-                        json_data = None
-                        json_content = None
+                        texto = future.result()
                         
-                        # Tentar extrair JSON de markdown code blocks primeiro
-                        import re
-                        json_match = re.search(r'```(?:json)?\s*\n?(.*?)\n?```', texto, re.DOTALL | re.IGNORECASE)
-                        if json_match:
-                            json_content = json_match.group(1).strip()
-                        else:
-                            # Se não há code blocks, tentar o texto inteiro
-                            json_content = texto.strip()
+                        # Exibir a transcrição
+                        print(f"\n📄 Transcrição ({note.title or 'Sem título'}, anexos {anexos}):")
+                        print("-" * 50)
+                        print(texto)
+                        print("-" * 50)
                         
-                        try:
-                            json_data = json.loads(json_content)
-                            # É JSON válido, salvar como .json
-                            out_file = img_path.with_suffix(".json")
-                            with open(out_file, "w", encoding="utf-8") as f:
-                                json.dump(json_data, f, indent=2, ensure_ascii=False)
-                            print(f"✅ JSON estruturado salvo em: {out_file}")
-                            
-                            # Indexar no ChromaDB para busca semântica
-                            if CHROMA_AVAILABLE and ENABLE_CHROMA_INDEXING:
-                                print("🔄 Indexando no ChromaDB para busca semântica...")
-                                if index_note_in_chroma(json_data):
-                                    print("✅ Nota indexada com sucesso no ChromaDB!")
-                                else:
-                                    print("⚠️ Falha na indexação no ChromaDB")
-                                
-                        except json.JSONDecodeError:
-                            # Não é JSON válido, salvar como .txt
-                            out_file = img_path.with_suffix(".txt")
-                            out_file.write_text(texto, encoding="utf-8")
-                            print(f"✅ Transcrição salva em: {out_file}")
-                        blobs_processed = True
+                        # Salvar a transcrição
+                        if persist_transcription(texto, img_path, pending_index):
+                            blobs_processed = True
                     except Exception as e:
-                        print(f"❌ Erro ao salvar o arquivo de saída: {e}")
-                except Exception as e:
-                    print(f"⚠️ Erro ao processar anexo {i+1}: {e}")
-                    # Depurar informações sobre o blob quando há erro
-                    debug_blob_info(blob)
-            
-            # Registrar a nota como processada apenas se pelo menos um blob foi processado com sucesso
-            if blobs_processed:
-                save_processed_note(note.id, label_name)
-                processed_count += 1
-        else:
-            print("ℹ️ Esta nota não contém anexos (imagens).")
+                        print(f"⚠️ Erro ao processar anexos {anexos}: {e}")
+                        # Depurar informações sobre os blobs quando há erro
+                        for _, blob, _ in chunk:
+                            debug_blob_info(blob)
+                
+                # Registrar a nota como processada apenas se pelo menos um blob foi processado com sucesso
+                if blobs_processed:
+                    save_processed_note(note.id, label_name)
+                    processed_count += 1
+        finally:
+            flush_chroma_index(pending_index)
     
+
     # Resumo final
     print(f"\n{'=' * 50}")
     print(f"✅ Processamento concluído")
@@ -581,61 +931,65 @@ def load_api_key_from_env_file():
 
 
 def load_processed_notes():
-    """Carrega a lista de IDs de notas já processadas do arquivo de registro"""
-    if not PROCESSED_NOTES_FILE.exists():
-        return {}
+    """
+    Carrega a lista de IDs de notas já processadas do arquivo de registro
+    
+    Os arquivos são lidos apenas uma vez por processo: o registro antigo em JSON
+    (se existir) é combinado com as linhas do registro append-only, ignorando
+    linhas inválidas. Cada label mapeia para um dict usado como conjunto ordenado
+    (busca O(1), mantendo a ordem de gravação).
+    """
+    global _processed_notes_cache
     
+    if _processed_notes_cache is not None:
+        return _processed_notes_cache
+    
+    processed_notes = {}
     try:
-        with open(PROCESSED_NOTES_FILE, 'r') as f:
-            return json.load(f)
+        if LEGACY_PROCESSED_NOTES_FILE.exists():
+            for label, ids in json_loads(LEGACY_PROCESSED_NOTES_FILE.read_bytes()).items():
+                processed_notes.setdefault(label, {}).update(dict.fromkeys(ids))
+        
+        if PROCESSED_NOTES_FILE.exists():
+            with open(PROCESSED_NOTES_FILE, 'rb') as f:
+                for line in f:
+                    try:
+                        record = json_loads(line)
+                        processed_notes.setdefault(record["label"], {})[record["id"]] = None
+                    except (ValueError, KeyError, TypeError):
+                        continue
     except Exception as e:
         print(f"⚠️ Erro ao carregar registro de notas processadas: {e}")
-        return {}
+    
+    _processed_notes_cache = processed_notes
+    return _processed_notes_cache
 
 
 def save_processed_note(note_id, label_name):
-    """Adiciona uma nota ao registro de notas processadas"""
-    processed_notes = load_processed_notes()
-    
-    # Organizar por label
-    if label_name not in processed_notes:
-        processed_notes[label_name] = []
-    
-    # Adicionar ID da nota se ainda não estiver na lista
-    if note_id not in processed_notes[label_name]:
-        processed_notes[label_name].append(note_id)
+    """Adiciona uma nota ao registro de notas processadas (acrescenta uma linha ao arquivo)"""
+    label_notes = load_processed_notes().setdefault(label_name, {})
+    if note_id in label_notes:
+        return
     
     try:
-        with open(PROCESSED_NOTES_FILE, 'w') as f:
-            json.dump(processed_notes, f, indent=2)
+        # Apenas acrescenta uma linha: o custo não cresce com o histórico
+        with open(PROCESSED_NOTES_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"label": label_name, "id": note_id}, ensure_ascii=False) + "\n")
+        label_notes[note_id] = None
     except Exception as e:
         print(f"⚠️ Erro ao salvar registro de notas processadas: {e}")
 
 
 def is_note_processed(note_id, label_name):
     """Verifica se uma nota já foi processada anteriormente"""
-    processed_notes = load_processed_notes()
-    
-    return (label_name in processed_notes and 
-            note_id in processed_notes[label_name])
+    return note_id in load_processed_notes().get(label_name, ())
 
 if __name__ == "__main__":
-    # Processar argumentos de linha de comando para opções
-    disable_indexing = False
-    
-    # Verificar opções nos argumentos
-    args_to_remove = []
-    for i, arg in enumerate(sys.argv):
-        if arg == "--no-index" or arg == "--disable-indexing":
-            disable_indexing = True
-            args_to_remove.append(i)
-    
-    # Remover argumentos de opção para não interferir com o processamento normal
-    for i in sorted(args_to_remove, reverse=True):
-        sys.argv.pop(i)
+    # Processar argumentos de linha de comando (--help é tratado pelo argparse)
+    args = parse_args()
     
     # Desativar indexação se solicitado
-    if disable_indexing:
+    if args.no_index:
         ENABLE_CHROMA_INDEXING = False
         print("ℹ️ Indexação no ChromaDB desativada pelo argumento de linha de comando")
     
@@ -653,7 +1007,7 @@ if __name__ == "__main__":
         
         # Verificar se o arquivo de configuração possui as credenciais do Google Keep
         # para alertar o usuário antecipadamente
-        if len(sys.argv) > 1 and not Path(sys.argv[1]).is_file() and not sys.argv[1].startswith("/"):
+        if is_keep_label(args.target):
             config = load_keep_credentials()
             if not config.get('GOOGLE_EMAIL') or not config.get('GOOGLE_MASTER_TOKEN'):
                 print("⚠️ Aviso: Credenciais do Google Keep não configuradas!")
@@ -667,7 +1021,7 @@ if __name__ == "__main__":
         versao = "0.8.0"
         print(f"\n{'=' * 58}\n{'📝 OCR de Notas Manuscritas - Versão ' + versao:^58}\n{'=' * 58}")
         
-        main()
+        main(args)
     except KeyboardInterrupt:
         sys.exit("\nOperação cancelada pelo usuário.")
     except Exception as e:
@@ -9,11 +9,41 @@ e obter uma estrutura JSON padronizada.
 import json
 import re
 import openai
-from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
 import logging
 
+# orjson (opcional) acelera a leitura das respostas do LLM; sem ele, usa a biblioteca padrão
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Bloco de código markdown (```json ... ```) em que o LLM costuma devolver o JSON
+_FENCE_RE = re.compile(r'```(?:json)?\s*\n?(.*?)\n?```', re.DOTALL | re.IGNORECASE)
+
+# Campos obrigatórios da nota estruturada e quais deles devem ser listas
+_REQUIRED_FIELDS = frozenset(("title", "data", "summary", "keywords", "tasks", "notes", "reminders"))
+_LIST_FIELDS = ("keywords", "tasks", "notes", "reminders")
+_VALID_STATUSES = frozenset(("done", "todo"))
+
+# Número máximo de chamadas simultâneas ao LLM em parse_ocr_texts (respeitar o rate limit)
+PARSE_WORKERS = 8
+
+# Notas enviadas por chamada em parse_ocr_batch (o prompt de sistema é enviado uma vez por lote)
+PARSE_BATCH_SIZE = 5
+
+# Instrução extra do prompt de sistema quando várias notas vão na mesma chamada
+_BATCH_PROMPT_SUFFIX = """
+
+MODO LOTE:
+Você receberá várias notas, cada uma iniciada por [NOTA n].
+Retorne um array JSON com um objeto por nota, na mesma ordem, cada objeto no formato acima.
+Retorne APENAS o array JSON válido, sem explicações adicionais."""
+
 def parse_ocr_text(text: str) -> Optional[Dict[str, Any]]:
     """
     Converte texto extraído do OCR em estrutura JSON usando LLM
@@ -32,26 +62,7 @@ def parse_ocr_text(text: str) -> Optional[Dict[str, Any]]:
         logger.info("🔄 Enviando texto para estruturação com LLM...")
         
         # Prompt otimizado para estruturação
-        prompt = _get_parsing_prompt()
-        
-        # Chamada para OpenAI
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": prompt
-                },
-                {
-                    "role": "user", 
-                    "content": f"Texto para estruturar:\n\n{text}"
-                }
-            ],
-            temperature=0.1,  # Baixa temperatura para consistência
-            max_tokens=2000
-        )
-        
-        structured_text = response.choices[0].message.content.strip()
+        structured_text = _complete(_PARSING_PROMPT, f"Texto para estruturar:\n\n{text}", max_tokens=2000)
         logger.info("✅ Resposta recebida do LLM")
         
         # Extrair JSON da resposta
@@ -72,6 +83,134 @@ def parse_ocr_text(text: str) -> Optional[Dict[str, Any]]:
         return None
 
 
+def parse_ocr_texts(texts: List[str], max_workers: int = PARSE_WORKERS) -> List[Optional[Dict[str, Any]]]:
+    """
+    Converte vários textos OCR em estruturas JSON, com as chamadas ao LLM em paralelo
+    
+    As chamadas são limitadas por rede: com até max_workers requisições em voo,
+    o tempo total deixa de ser a soma das latências de cada nota.
+    
+    Args:
+        texts (List[str]): Textos extraídos do OCR
+        max_workers (int): Máximo de chamadas simultâneas à API
+        
+    Returns:
+        List[Optional[Dict[str, Any]]]: Resultado de cada texto (None se falhar), na mesma ordem da entrada
+    """
+    if not texts:
+        return []
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(texts)))) as executor:
+        return list(executor.map(parse_ocr_text, texts))
+
+
+def parse_ocr_batch(texts: List[str], batch_size: int = PARSE_BATCH_SIZE) -> List[Optional[Dict[str, Any]]]:
+    """
+    Converte vários textos OCR em estruturas JSON enviando batch_size notas por chamada ao LLM
+    
+    O prompt de sistema é enviado uma vez por lote e o modelo devolve um array JSON
+    com um objeto por nota. Se o array vier com tamanho diferente do lote, o lote
+    inteiro é refeito nota a nota; itens inválidos dentro de um array válido são
+    refeitos individualmente.
+    
+    Args:
+        texts (List[str]): Textos extraídos do OCR
+        batch_size (int): Número de notas por chamada
+        
+    Returns:
+        List[Optional[Dict[str, Any]]]: Resultado de cada texto (None se falhar), na mesma ordem da entrada
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+    
+    # Textos vazios não vão para o LLM
+    indices = [i for i, text in enumerate(texts) if text and text.strip()]
+    batches = [indices[start:start + max(1, batch_size)] for start in range(0, len(indices), max(1, batch_size))]
+    if not batches:
+        return results
+    
+    with ThreadPoolExecutor(max_workers=min(PARSE_WORKERS, len(batches))) as executor:
+        batch_results = executor.map(lambda batch: _parse_batch([texts[i] for i in batch]), batches)
+        for batch, parsed in zip(batches, batch_results):
+            for i, json_data in zip(batch, parsed):
+                results[i] = json_data
+    
+    # Fallback individual para o que o lote não resolveu
+    retry = [i for i in indices if results[i] is None]
+    for i, json_data in zip(retry, parse_ocr_texts([texts[i] for i in retry])):
+        results[i] = json_data
+    
+    return results
+
+
+def _parse_batch(texts: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Estrutura um lote de textos em uma única chamada ao LLM
+    
+    Returns:
+        List[Optional[Dict[str, Any]]]: Um item por texto; todos None se a resposta
+        não for um array com exatamente um objeto por nota
+    """
+    notes = "\n\n".join(f"[NOTA {n}]\n{text}" for n, text in enumerate(texts, 1))
+    try:
+        logger.info(f"🔄 Enviando lote de {len(texts)} textos para estruturação com LLM...")
+        response_text = _complete(
+            _BATCH_PARSING_PROMPT,
+            f"Estruture as seguintes {len(texts)} notas, retornando um array JSON:\n\n{notes}",
+            max_tokens=min(2000 * len(texts), 16000),
+        )
+        json_array = _load_json_from_response(response_text)
+    except Exception as e:
+        logger.warning(f"⚠️ Falha no lote de {len(texts)} notas, refazendo individualmente: {e}")
+        return [None] * len(texts)
+    
+    if not isinstance(json_array, list) or len(json_array) != len(texts):
+        logger.warning(f"⚠️ Resposta do lote não tem {len(texts)} objetos, refazendo individualmente")
+        return [None] * len(texts)
+    
+    return [_validate_batch_item(json_data) for json_data in json_array]
+
+
+def _validate_batch_item(json_data: Any) -> Optional[Dict[str, Any]]:
+    """
+    Valida um item do array devolvido pelo lote
+    
+    Returns:
+        Optional[Dict[str, Any]]: O item, se válido; None (refeito individualmente)
+        se inválido ou se a validação falhar
+    """
+    try:
+        if isinstance(json_data, dict) and _validate_json_structure(json_data):
+            return json_data
+    except Exception as e:
+        logger.warning(f"⚠️ Item inválido no lote, refazendo individualmente: {e}")
+    return None
+
+
+def _complete(system_prompt: str, user_content: str, max_tokens: int) -> str:
+    """
+    Envia o prompt de sistema e o conteúdo ao LLM e retorna o texto da resposta
+    
+    Returns:
+        str: Resposta do modelo (sem espaços nas pontas)
+    """
+    response = openai.chat.completions.create(
+        model="gpt-4o",
+        messages=[
+            {
+                "role": "system",
+                "content": system_prompt
+            },
+            {
+                "role": "user", 
+                "content": user_content
+            }
+        ],
+        temperature=0.1,  # Baixa temperatura para consistência
+        max_tokens=max_tokens
+    )
+    return response.choices[0].message.content.strip()
+
+
 def _get_parsing_prompt() -> str:
     """
     Retorna o prompt otimizado para estruturação de texto
@@ -114,6 +253,11 @@ Exemplo de saída:
 }"""
 
 
+# Prompts de sistema montados uma única vez (usados em toda chamada ao LLM)
+_PARSING_PROMPT = _get_parsing_prompt()
+_BATCH_PARSING_PROMPT = _PARSING_PROMPT + _BATCH_PROMPT_SUFFIX
+
+
 def _extract_json_from_response(response_text: str) -> Optional[Dict[str, Any]]:
     """
     Extrai JSON da resposta do LLM, tratando diferentes formatos
@@ -125,19 +269,10 @@ def _extract_json_from_response(response_text: str) -> Optional[Dict[str, Any]]:
         Optional[Dict[str, Any]]: JSON extraído ou None se falhar
     """
     try:
-        # Tentar extrair JSON de markdown code blocks primeiro
-        json_match = re.search(r'```(?:json)?\s*\n?(.*?)\n?```', response_text, re.DOTALL | re.IGNORECASE)
-        if json_match:
-            json_content = json_match.group(1).strip()
-        else:
-            # Se não há code blocks, usar o texto inteiro
-            json_content = response_text.strip()
-        
-        # Tentar fazer parse do JSON
-        json_data = json.loads(json_content)
+        json_data = _load_json_from_response(response_text)
         
         # Validar estrutura básica
-        if _validate_json_structure(json_data):
+        if isinstance(json_data, dict) and _validate_json_structure(json_data):
             return json_data
         else:
             logger.warning("⚠️ Estrutura JSON inválida")
@@ -151,6 +286,38 @@ def _extract_json_from_response(response_text: str) -> Optional[Dict[str, Any]]:
         return None
 
 
+def _load_json_from_response(response_text: str) -> Any:
+    """
+    Decodifica o JSON da resposta do LLM (dentro de bloco de código markdown ou o texto inteiro)
+    
+    Raises:
+        json.JSONDecodeError: Se o conteúdo não for JSON válido
+    """
+    # Tentar extrair JSON de markdown code blocks primeiro
+    json_match = _FENCE_RE.search(response_text)
+    if json_match:
+        json_content = json_match.group(1).strip()
+    else:
+        # Se não há code blocks, usar o texto inteiro
+        json_content = response_text.strip()
+    
+    return _json_loads(json_content)
+
+
+def _json_loads(content: str) -> Any:
+    """Decodifica JSON com orjson, se disponível; erros são json.JSONDecodeError"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def _json_dumps(data: Any) -> str:
+    """Serializa JSON indentado (sem escapar acentos) com orjson, se disponível"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(data, indent=2, ensure_ascii=False)
+
+
 def _validate_json_structure(json_data: Dict[str, Any]) -> bool:
     """
     Valida se a estrutura JSON contém os campos esperados
@@ -161,30 +328,17 @@ def _validate_json_structure(json_data: Dict[str, Any]) -> bool:
     Returns:
         bool: True se estrutura é válida
     """
-    required_fields = ["title", "data", "summary", "keywords", "tasks", "notes", "reminders"]
-    
-    # Verificar se todos os campos obrigatórios existem
-    for field in required_fields:
-        if field not in json_data:
-            logger.warning(f"⚠️ Campo obrigatório ausente: {field}")
-            return False
+    # Verificar se todos os campos obrigatórios existem (uma única diferença de conjuntos)
+    missing = _REQUIRED_FIELDS.difference(json_data)
+    if missing:
+        logger.warning(f"⚠️ Campos obrigatórios ausentes: {', '.join(sorted(missing))}")
+        return False
     
     # Verificar tipos de dados
-    if not isinstance(json_data.get("keywords"), list):
-        logger.warning("⚠️ Campo 'keywords' deve ser uma lista")
-        return False
-        
-    if not isinstance(json_data.get("tasks"), list):
-        logger.warning("⚠️ Campo 'tasks' deve ser uma lista")
-        return False
-        
-    if not isinstance(json_data.get("notes"), list):
-        logger.warning("⚠️ Campo 'notes' deve ser uma lista")
-        return False
-        
-    if not isinstance(json_data.get("reminders"), list):
-        logger.warning("⚠️ Campo 'reminders' deve ser uma lista")
-        return False
+    for field in _LIST_FIELDS:
+        if not isinstance(json_data[field], list):
+            logger.warning(f"⚠️ Campo '{field}' deve ser uma lista")
+            return False
     
     # Validar estrutura de tarefas
     for task in json_data.get("tasks", []):
@@ -194,7 +348,9 @@ def _validate_json_structure(json_data: Dict[str, Any]) -> bool:
         if "task" not in task or "status" not in task:
             logger.warning("⚠️ Cada tarefa deve ter 'task' e 'status'")
             return False
-        if task.get("status") not in ["done", "todo"]:
+        # Checar o tipo antes: valores não hashable (lista, dict) quebrariam o teste no frozenset
+        status = task["status"]
+        if not isinstance(status, str) or status not in _VALID_STATUSES:
             logger.warning("⚠️ Status da tarefa deve ser 'done' ou 'todo'")
             return False
     
@@ -211,42 +367,27 @@ def clean_and_validate_json(json_data: Dict[str, Any]) -> Dict[str, Any]:
     Returns:
         Dict[str, Any]: Dados JSON limpos e validados
     """
-    cleaned_data = {}
-    
     # Campos de string
-    string_fields = ["title", "data", "summary"]
-    for field in string_fields:
-        cleaned_data[field] = str(json_data.get(field, "")).strip()
-    
-    # Campos de lista
-    list_fields = ["keywords", "notes", "reminders"]
-    for field in list_fields:
-        raw_data = json_data.get(field, [])
-        if isinstance(raw_data, list):
-            cleaned_data[field] = [str(item).strip() for item in raw_data if str(item).strip()]
-        else:
-            cleaned_data[field] = []
-    
-    # Campo de tarefas (estrutura especial)
-    tasks = json_data.get("tasks", [])
-    cleaned_tasks = []
+    cleaned_data = {field: str(json_data.get(field, "")).strip() for field in ("title", "data", "summary")}
     
-    for task in tasks:
-        if isinstance(task, dict):
-            task_text = str(task.get("task", "")).strip()
-            task_status = task.get("status", "todo")
-            
-            # Normalizar status
-            if task_status not in ["done", "todo"]:
-                task_status = "todo"
-            
-            if task_text:
-                cleaned_tasks.append({
-                    "task": task_text,
-                    "status": task_status
-                })
+    # Campos de lista (cada item convertido e aparado uma única vez; itens vazios descartados)
+    for field in ("keywords", "notes", "reminders"):
+        raw_data = json_data.get(field)
+        cleaned_data[field] = (
+            [text for item in raw_data if (text := str(item).strip())]
+            if isinstance(raw_data, list) else []
+        )
     
-    cleaned_data["tasks"] = cleaned_tasks
+    # Campo de tarefas (estrutura especial; status inválido vira "todo")
+    tasks = json_data.get("tasks")
+    cleaned_data["tasks"] = [
+        {
+            "task": task_text,
+            "status": status if isinstance(status := task.get("status"), str) and status in _VALID_STATUSES else "todo"
+        }
+        for task in (tasks if isinstance(tasks, list) else ())
+        if isinstance(task, dict) and (task_text := str(task.get("task", "")).strip())
+    ]
     
     logger.info("✅ JSON limpo e validado")
     return cleaned_data
@@ -275,6 +416,6 @@ if __name__ == "__main__":
     result = parse_ocr_text(test_text)
     if result:
         print("✅ Teste bem-sucedido!")
-        print(json.dumps(result, indent=2, ensure_ascii=False))
+        print(_json_dumps(result))
     else:
         print("❌ Teste falhou!")
@@ -6,19 +6,87 @@ Este módulo contém funções para formatar os resultados da busca semântica
 do ChromaDB em contexto otimizado para modelos LLM em aplicações RAG.
 """
 
-import json
-from typing import List, Dict, Any
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
-def format_for_rag(results: List[Dict[str, Any]], max_tokens: int = 1500) -> str:
+# Estimativa simples: ~4 caracteres por token para português
+def _chars_to_tokens(n_chars: int) -> int:
+    """Converte número de caracteres em tokens estimados"""
+    return n_chars // 4
+
+
+def _tokens_to_chars(n_tokens: int) -> int:
+    """Converte limite de tokens em limite aproximado de caracteres"""
+    return n_tokens * 4
+
+
+class RagField(NamedTuple):
+    """Campo de metadados exibido em cada nota do contexto RAG"""
+    key: str
+    label: str
+    default: Any = ''
+    # Formata o valor; retorno vazio/None omite a linha (padrão: o próprio valor)
+    render: Optional[Callable[[Any, Dict[str, Any]], Any]] = None
+
+
+class RagLayout(NamedTuple):
+    """Layout de um formato de contexto RAG (campos, cabeçalhos e rodapé)"""
+    fields: Tuple[RagField, ...]
+    note_header: str        # Formatado com i (posição) e title
+    document_label: str
+    similarity_format: str
+    header: str             # Formatado com count (notas incluídas)
+    footer: str
+    error_label: str
+
+
+def _render_task_stats(total_tasks: Any, metadata: Dict[str, Any]) -> Optional[str]:
+    """Resumo das tarefas da nota, apenas se houver alguma"""
+    if total_tasks > 0:
+        return f"{metadata.get('done_tasks', 0)} concluídas, {metadata.get('todo_tasks', 0)} pendentes"
+    return None
+
+
+_BASIC_LAYOUT = RagLayout(
+    fields=(
+        RagField('title', 'Título', 'Sem título'),
+        RagField('data', 'Data'),
+        RagField('summary', 'Resumo'),
+    ),
+    note_header="\n--- NOTA {i} ---",
+    document_label="Conteúdo",
+    similarity_format=".2f",
+    header="=== CONTEXTO DAS SUAS ANOTAÇÕES ===\nTotal de notas relevantes: {count}\n",
+    footer="\n=== FIM DO CONTEXTO ===",
+    error_label="resultado",
+)
+
+_DETAILED_LAYOUT = RagLayout(
+    fields=(
+        RagField('data', 'Data'),
+        RagField('summary', 'Resumo'),
+        RagField('keywords', 'Palavras-chave'),
+        RagField('total_tasks', 'Tarefas', 0, _render_task_stats),
+    ),
+    note_header="\n--- NOTA {i}: {title} ---",
+    document_label="Conteúdo completo",
+    similarity_format=".3f",
+    header="=== SUAS ANOTAÇÕES PESSOAIS ===\nEncontradas {count} notas relevantes:\n",
+    footer="\n=== FIM DAS ANOTAÇÕES ===",
+    error_label="resultado detalhado",
+)
+
+
+def _format_results(results: List[Dict[str, Any]], max_tokens: int, layout: RagLayout) -> str:
     """
-    Formata resultados da busca semântica para contexto RAG
+    Monta o contexto RAG de acordo com um layout, em uma única passada pelos resultados
     
     Args:
         results (List[Dict]): Lista de resultados do ChromaIndexer.search_similar_notes()
-        max_tokens (int): Limite aproximado de tokens (padrão: 1500)
+        max_tokens (int): Limite aproximado de tokens
+        layout (RagLayout): Campos, cabeçalhos e rodapé do formato
         
     Returns:
         str: Contexto formatado para uso em prompts RAG
@@ -28,59 +96,67 @@ def format_for_rag(results: List[Dict[str, Any]], max_tokens: int = 1500) -> str
     
     context_parts = []
     total_chars = 0
-    # Estimativa: ~4 caracteres por token
-    max_chars = max_tokens * 4
+    max_chars = _tokens_to_chars(max_tokens)
     
     for i, result in enumerate(results, 1):
         try:
             metadata = result.get('metadata', {})
             similarity = result.get('similarity', 0.0)
             
-            # Extrair campos principais
-            title = metadata.get('title', 'Sem título')
-            summary = metadata.get('summary', '')
-            date = metadata.get('data', '')
+            # Formatar seção da nota (partes unidas uma única vez no final)
+            parts = [layout.note_header.format(i=i, title=metadata.get('title', 'Sem título'))]
+            for field in layout.fields:
+                value = metadata.get(field.key, field.default)
+                if field.render is not None:
+                    value = field.render(value, metadata)
+                if value:
+                    parts.append(f"\n{field.label}: {value}")
             
-            # Formatar seção da nota
-            note_section = f"\n--- NOTA {i} ---"
-            if title:
-                note_section += f"\nTítulo: {title}"
-            if date:
-                note_section += f"\nData: {date}"
-            if summary:
-                note_section += f"\nResumo: {summary}"
-            
-            # Adicionar conteúdo detalhado do documento
+            # Adicionar conteúdo do documento
             document = result.get('document', '')
             if document:
-                note_section += f"\nConteúdo: {document}"
+                parts.append(f"\n{layout.document_label}: {document}")
             
             # Adicionar informação de relevância
-            note_section += f"\nRelevância: {similarity:.2f}"
-            note_section += "\n"
+            parts.append(f"\nRelevância: {similarity:{layout.similarity_format}}\n")
+            note_section = "".join(parts)
+            section_chars = len(note_section)
             
             # Verificar limite de tokens
-            if total_chars + len(note_section) > max_chars:
+            if total_chars + section_chars > max_chars:
                 logger.info(f"Limite de tokens atingido. Incluindo {i-1} de {len(results)} notas.")
                 break
             
             context_parts.append(note_section)
-            total_chars += len(note_section)
+            total_chars += section_chars
             
         except Exception as e:
-            logger.warning(f"Erro ao formatar resultado {i}: {e}")
+            logger.warning(f"Erro ao formatar {layout.error_label} {i}: {e}")
             continue
     
     if not context_parts:
         return "Erro ao processar as notas encontradas."
     
     # Montar contexto final
-    context = "=== CONTEXTO DAS SUAS ANOTAÇÕES ===\n"
-    context += f"Total de notas relevantes: {len(context_parts)}\n"
-    context += "".join(context_parts)
-    context += "\n=== FIM DO CONTEXTO ==="
+    return "".join((
+        layout.header.format(count=len(context_parts)),
+        *context_parts,
+        layout.footer,
+    ))
+
+
+def format_for_rag(results: List[Dict[str, Any]], max_tokens: int = 1500) -> str:
+    """
+    Formata resultados da busca semântica para contexto RAG
     
-    return context
+    Args:
+        results (List[Dict]): Lista de resultados do ChromaIndexer.search_similar_notes()
+        max_tokens (int): Limite aproximado de tokens (padrão: 1500)
+        
+    Returns:
+        str: Contexto formatado para uso em prompts RAG
+    """
+    return _format_results(results, max_tokens, _BASIC_LAYOUT)
 
 
 def format_for_rag_detailed(results: List[Dict[str, Any]], max_tokens: int = 1500) -> str:
@@ -94,72 +170,7 @@ def format_for_rag_detailed(results: List[Dict[str, Any]], max_tokens: int = 150
     Returns:
         str: Contexto detalhado formatado para uso em prompts RAG
     """
-    if not results:
-        return "Nenhuma nota relevante encontrada."
-    
-    context_parts = []
-    total_chars = 0
-    max_chars = max_tokens * 4
-    
-    for i, result in enumerate(results, 1):
-        try:
-            metadata = result.get('metadata', {})
-            similarity = result.get('similarity', 0.0)
-            
-            # Extrair campos principais
-            title = metadata.get('title', 'Sem título')
-            summary = metadata.get('summary', '')
-            date = metadata.get('data', '')
-            keywords = metadata.get('keywords', '')
-            
-            # Estatísticas de tarefas
-            total_tasks = metadata.get('total_tasks', 0)
-            done_tasks = metadata.get('done_tasks', 0)
-            todo_tasks = metadata.get('todo_tasks', 0)
-            
-            # Formar seção da nota
-            note_section = f"\n--- NOTA {i}: {title} ---"
-            if date:
-                note_section += f"\nData: {date}"
-            if summary:
-                note_section += f"\nResumo: {summary}"
-            if keywords:
-                note_section += f"\nPalavras-chave: {keywords}"
-            
-            # Adicionar estatísticas de tarefas se houver
-            if total_tasks > 0:
-                note_section += f"\nTarefas: {done_tasks} concluídas, {todo_tasks} pendentes"
-            
-            # Adicionar documento completo
-            document = result.get('document', '')
-            if document:
-                note_section += f"\nConteúdo completo: {document}"
-            
-            note_section += f"\nRelevância: {similarity:.3f}"
-            note_section += "\n"
-            
-            # Verificar limite
-            if total_chars + len(note_section) > max_chars:
-                logger.info(f"Limite de tokens atingido. Incluindo {i-1} de {len(results)} notas.")
-                break
-            
-            context_parts.append(note_section)
-            total_chars += len(note_section)
-            
-        except Exception as e:
-            logger.warning(f"Erro ao formatar resultado detalhado {i}: {e}")
-            continue
-    
-    if not context_parts:
-        return "Erro ao processar as notas encontradas."
-    
-    # Contexto final
-    context = "=== SUAS ANOTAÇÕES PESSOAIS ===\n"
-    context += f"Encontradas {len(context_parts)} notas relevantes:\n"
-    context += "".join(context_parts)
-    context += "\n=== FIM DAS ANOTAÇÕES ==="
-    
-    return context
+    return _format_results(results, max_tokens, _DETAILED_LAYOUT)
 
 
 def estimate_tokens(text: str) -> int:
@@ -172,8 +183,7 @@ def estimate_tokens(text: str) -> int:
     Returns:
         int: Número estimado de tokens
     """
-    # Estimativa simples: ~4 caracteres por token para português
-    return len(text) // 4
+    return _chars_to_tokens(len(text))
 
 
 def truncate_context(context: str, max_tokens: int) -> str:
@@ -187,22 +197,18 @@ def truncate_context(context: str, max_tokens: int) -> str:
     Returns:
         str: Contexto truncado
     """
-    max_chars = max_tokens * 4
+    max_chars = _tokens_to_chars(max_tokens)
     
     if len(context) <= max_chars:
         return context
     
-    # Truncar e adicionar indicação
-    truncated = context[:max_chars]
-    
-    # Tentar truncar em uma quebra de linha
-    last_newline = truncated.rfind('\n')
-    if last_newline > max_chars * 0.8:  # Se a quebra está nos últimos 20%
-        truncated = truncated[:last_newline]
+    # Tentar truncar em uma quebra de linha, procurando apenas nos últimos 20%
+    # da janela e direto no texto original (uma única cópia ao fatiar)
+    last_newline = context.rfind('\n', int(max_chars * 0.8) + 1, max_chars)
+    cut = last_newline if last_newline != -1 else max_chars
     
-    truncated += "\n\n[CONTEXTO TRUNCADO DEVIDO AO LIMITE DE TOKENS]"
-    
-    return truncated
+    # Truncar e adicionar indicação
+    return context[:cut] + "\n\n[CONTEXTO TRUNCADO DEVIDO AO LIMITE DE TOKENS]"
 
 
 if __name__ == "__main__":
@@ -5,23 +5,33 @@ Substitui o run_loop.sh com execução em container Docker
 """
 
 import schedule
-import time
 import subprocess
 import logging
 import sys
 import signal
+import threading
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 
-# Variável global para controle de parada
-shutdown_flag = False
+# Label processada pela execução agendada e tempo limite de cada execução (segundos)
+PIPELINE_LABEL = "Anotações diárias"
+PIPELINE_TIMEOUT = 1800  # 30 minutos
+
+# Impede execuções sobrepostas (ex.: execução anterior ainda rodando após o tempo limite)
+_pipeline_lock = threading.Lock()
+
+# Espera máxima entre verificações (protege contra ajustes de relógio/suspensão do host)
+MAX_IDLE_SECONDS = 3600
+
+# Sinalizado para parar o scheduler (acorda imediatamente a espera do loop principal)
+shutdown_event = threading.Event()
 
 def signal_handler(signum, frame):
     """Handler para sinais de parada (SIGTERM, SIGINT)"""
-    global shutdown_flag
     signal_name = signal.Signals(signum).name
     logger.info(f"🛑 Recebido sinal {signal_name}. Parando scheduler...")
-    shutdown_flag = True
+    shutdown_event.set()
 
 # Configurar logging
 logging.basicConfig(
@@ -38,20 +48,44 @@ def log_message(message: str):
     """Log com timestamp formatado"""
     logger.info(f"🕒 {message}")
 
-def run_pipeline():
-    """Executa o pipeline principal"""
+@lru_cache(maxsize=1)
+def _load_pipeline():
+    """
+    Importa o pipeline para execução no próprio processo (apenas uma vez)
+    
+    Returns:
+        Função run_pipeline de src.main, ou None se a importação falhar
+        (nesse caso o pipeline é executado em subprocess)
+    """
+    try:
+        from src.main import run_pipeline as pipeline
+        return pipeline
+    except (Exception, SystemExit) as e:
+        log_message(f"⚠️ Não foi possível importar o pipeline ({e}); usando subprocess")
+        return None
+
+
+def _run_in_process(pipeline):
+    """Executa o pipeline na thread atual e registra o resultado"""
+    try:
+        pipeline(PIPELINE_LABEL)
+        log_message("✅ Pipeline executado com sucesso")
+    except BaseException as e:
+        log_message(f"❌ Pipeline falhou: {e}")
+    finally:
+        _pipeline_lock.release()
+
+
+def _run_pipeline_subprocess():
+    """Executa o pipeline em um novo processo Python (fallback)"""
     try:
-        log_message("🚀 Iniciando execução agendada do pipeline OCR Keep")
-        log_message("🏷️ Filtro de label: 'Anotações diárias'")
-        
-        # Executar pipeline principal
         result = subprocess.run([
-            sys.executable, "-m", "src.main", "Anotações diárias"
+            sys.executable, "-m", "src.main", PIPELINE_LABEL
         ], 
         cwd="/app",
         capture_output=True, 
         text=True,
-        timeout=1800  # 30 minutos timeout
+        timeout=PIPELINE_TIMEOUT
         )
         
         if result.returncode == 0:
@@ -63,9 +97,44 @@ def run_pipeline():
             
     except subprocess.TimeoutExpired:
         log_message("⏰ Pipeline excedeu tempo limite de 30 minutos")
+
+
+def run_pipeline():
+    """
+    Executa o pipeline principal
+    
+    O pipeline roda no próprio processo, em uma thread: os módulos (OpenAI,
+    ChromaDB, modelo de embeddings) são carregados uma vez e reaproveitados
+    entre execuções, sem o custo de iniciar um novo interpretador.
+    """
+    try:
+        log_message("🚀 Iniciando execução agendada do pipeline OCR Keep")
+        log_message(f"🏷️ Filtro de label: '{PIPELINE_LABEL}'")
+        
+        if not _pipeline_lock.acquire(blocking=False):
+            log_message("⏭️ Execução anterior ainda em andamento. Pulando...")
+            return
+        
+        pipeline = _load_pipeline()
+        if pipeline is None:
+            try:
+                _run_pipeline_subprocess()
+            finally:
+                _pipeline_lock.release()
+            return
+        
+        # Executar pipeline principal (o lock é liberado pela thread ao terminar)
+        worker = threading.Thread(target=_run_in_process, args=(pipeline,), name="pipeline", daemon=True)
+        worker.start()
+        worker.join(PIPELINE_TIMEOUT)
+        
+        if worker.is_alive():
+            log_message("⏰ Pipeline excedeu tempo limite de 30 minutos (continua em segundo plano)")
+            
     except Exception as e:
         log_message(f"💥 Erro inesperado: {e}")
 
+
 def next_execution_time():
     """Calcula próximo horário de execução"""
     current_hour = datetime.now().hour
@@ -89,19 +158,22 @@ def main():
     # Agendar execução diária às 23:45
     schedule.every().day.at("23:45").do(run_pipeline)
     
-    # Manter o scheduler rodando
-    while not shutdown_flag:
+    # Manter o scheduler rodando: dorme até o próximo agendamento (ou até um sinal de parada)
+    while not shutdown_event.is_set():
         try:
             schedule.run_pending()
-            log_message("🔄 Verificando agendamentos pendentes...")
-            time.sleep(60)  # Verificar a cada minuto
+            
+            idle_seconds = schedule.idle_seconds()
+            if idle_seconds is None:
+                idle_seconds = MAX_IDLE_SECONDS
+            shutdown_event.wait(min(max(idle_seconds, 0), MAX_IDLE_SECONDS))
             
         except KeyboardInterrupt:
             log_message("🛑 Scheduler interrompido pelo usuário")
             break
         except Exception as e:
             log_message(f"❌ Erro no scheduler: {e}")
-            time.sleep(300)  # Aguardar 5 minutos antes de tentar novamente
+            shutdown_event.wait(300)  # Aguardar 5 minutos antes de tentar novamente
     
     log_message("✅ Scheduler finalizado graciosamente")
 
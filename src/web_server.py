@@ -5,18 +5,17 @@ Expõe endpoint HTTP para consultas RAG via WhatsApp bot
 """
 
 from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
 from contextlib import asynccontextmanager
-import sys
+from collections import OrderedDict
+import asyncio
 import os
-from pathlib import Path
 import logging
+import time
+import numpy as np
 import uvicorn
 
-# Adicionar diretório raiz ao path
-ROOT_DIR = Path(__file__).parent.parent
-sys.path.insert(0, str(ROOT_DIR))
-
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,13 +23,121 @@ logger = logging.getLogger(__name__)
 # Instância global do ChatRAG
 chat_rag = None
 
+# Máximo de consultas RAG simultâneas (evita estourar o rate limit da OpenAI em rajadas)
+QUERY_CONCURRENCY = int(os.environ.get("RAG_QUERY_CONCURRENCY", "16"))
+_query_semaphore = asyncio.Semaphore(QUERY_CONCURRENCY)
+
+# Cache semântico de respostas: consultas quase idênticas reutilizam a resposta anterior
+RESPONSE_CACHE_SIZE = int(os.environ.get("RAG_RESPONSE_CACHE_SIZE", "256"))
+RESPONSE_CACHE_THRESHOLD = float(os.environ.get("RAG_RESPONSE_CACHE_THRESHOLD", "0.95"))
+
+# Prefixo das respostas de erro do ChatRAG (nunca armazenadas no cache)
+_ERROR_RESPONSE_PREFIX = "Desculpe, ocorreu um erro"
+
+
+class SemanticResponseCache:
+    """
+    Cache LRU de respostas indexado pelo embedding da consulta
+    
+    Uma consulta cujo embedding tenha similaridade de cosseno acima do limiar
+    com alguma consulta recente devolve a resposta armazenada, evitando a busca
+    no ChromaDB e a chamada ao LLM. O cache é descartado sempre que a versão do
+    índice muda (notas novas ou reindexadas tornam as respostas obsoletas).
+    
+    Parâmetros da consulta como `stream` só mudam a forma de entrega, não o
+    conteúdo da resposta, por isso não fazem parte da chave.
+    
+    Acessado apenas a partir do event loop, portanto não usa lock.
+    """
+    
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE, threshold: float = RESPONSE_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._entries = OrderedDict()  # consulta -> (embedding normalizado, resposta)
+        self._matrix = None  # embeddings empilhados, reconstruído sob demanda
+        self._index_version = None
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+    
+    def clear(self):
+        """Descarta todas as respostas armazenadas"""
+        self._entries.clear()
+        self._matrix = None
+    
+    def sync(self, index_version):
+        """
+        Invalida o cache se a versão do índice mudou
+        
+        Args:
+            index_version: Versão atual do índice (ChromaIndexer.get_index_version)
+        """
+        if index_version != self._index_version:
+            if self._entries:
+                logger.info("🔄 Índice atualizado, descartando cache de respostas")
+            self.clear()
+            self._index_version = index_version
+    
+    def get(self, embedding: np.ndarray):
+        """
+        Procura uma resposta para uma consulta semanticamente equivalente
+        
+        Args:
+            embedding (np.ndarray): Embedding da consulta
+            
+        Returns:
+            Optional[str]: Resposta armazenada ou None
+        """
+        if not self._entries:
+            self.misses += 1
+            return None
+        
+        if self._matrix is None:
+            self._matrix = np.stack([vector for vector, _ in self._entries.values()])
+        
+        similarities = self._matrix @ self._normalize(embedding)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            self.misses += 1
+            return None
+        
+        key = list(self._entries)[best]
+        self._entries.move_to_end(key)
+        self._matrix = None
+        self.hits += 1
+        return self._entries[key][1]
+    
+    def put(self, query: str, embedding: np.ndarray, response: str):
+        """
+        Armazena a resposta de uma consulta, descartando a menos recente se cheio
+        
+        Args:
+            query (str): Texto da consulta
+            embedding (np.ndarray): Embedding da consulta
+            response (str): Resposta gerada
+        """
+        self._entries[query] = (self._normalize(embedding), response)
+        self._entries.move_to_end(query)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._matrix = None
+    
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_response_cache = SemanticResponseCache()
+
 def initialize_chat_rag():
     """Inicializa o sistema ChatRAG"""
     global chat_rag
     try:
-        # Importar ChatRAG
-        sys.path.insert(0, str(ROOT_DIR / 'scripts'))
-        from chat_rag import ChatRAG
+        # Importar ChatRAG (pacotes src e scripts instalados via `pip install -e .`)
+        from scripts.chat_rag import ChatRAG
         
         chat_rag = ChatRAG()
         logger.info("✅ Sistema ChatRAG inicializado com sucesso")
@@ -67,13 +174,44 @@ async def health_check():
         raise HTTPException(status_code=503, detail="Sistema RAG não inicializado")
     return {"status": "healthy", "service": "keep-ocr-pipeline"}
 
+async def _stream_response(query: str, embedding: np.ndarray, context: str, received_at: float):
+    """
+    Repassa a resposta do LLM em trechos à medida que chegam
+    
+    A resposta completa é armazenada no cache semântico ao final do streaming.
+    
+    Args:
+        query: Consulta já normalizada
+        embedding: Embedding da consulta
+        context: Contexto RAG encontrado
+        received_at: Instante (perf_counter) em que a requisição chegou
+    """
+    parts = []
+    async with _query_semaphore:
+        async for piece in iterate_in_threadpool(chat_rag.generate_response_stream(query, context)):
+            if not parts:
+                logger.info(f"📤 Primeiro trecho da resposta em {time.perf_counter() - received_at:.2f}s")
+            parts.append(piece)
+            yield piece
+    
+    if parts and not parts[-1].startswith(_ERROR_RESPONSE_PREFIX):
+        _response_cache.put(query, embedding, "".join(parts).strip())
+    
+    logger.info(
+        f"✅ Resposta transmitida ({sum(map(len, parts))} chars) em {time.perf_counter() - received_at:.2f}s"
+    )
+
 @app.get("/query", response_class=PlainTextResponse)
-async def query_notes(text: str = Query(..., description="Texto da consulta")):
+async def query_notes(
+    text: str = Query(..., description="Texto da consulta"),
+    stream: bool = Query(False, description="Envia a resposta à medida que é gerada")
+):
     """
     Endpoint para consultas ao sistema RAG
     
     Args:
         text: Texto da consulta/pergunta
+        stream: Se True, transmite a resposta em trechos (mesmo corpo em texto simples)
         
     Returns:
         Resposta em texto simples
@@ -84,16 +222,47 @@ async def query_notes(text: str = Query(..., description="Texto da consulta")):
     if not text or not text.strip():
         raise HTTPException(status_code=400, detail="Parâmetro 'text' é obrigatório")
     
+    query = text.strip()
+    received_at = time.perf_counter()
+    
     try:
         logger.info(f"📝 Nova consulta: {text[:100]}...")
         
-        # Buscar contexto
-        context = chat_rag.search_context(text.strip())
+        # Consultar o cache semântico (o embedding fica em cache e é reaproveitado na busca)
+        index_version = await asyncio.to_thread(chat_rag.indexer.get_index_version)
+        _response_cache.sync(index_version)
+        embedding = await asyncio.to_thread(chat_rag.indexer.embed_query, query)
+        cached = _response_cache.get(embedding)
+        if cached is not None:
+            logger.info(f"⚡ Resposta do cache ({len(cached)} chars) em {time.perf_counter() - received_at:.3f}s")
+            return cached
+        
+        if stream:
+            async with _query_semaphore:
+                context = await asyncio.to_thread(chat_rag.search_context, query)
+            return StreamingResponse(
+                _stream_response(query, embedding, context, received_at),
+                media_type="text/plain; charset=utf-8"
+            )
         
-        # Gerar resposta
-        response = chat_rag.generate_response(text.strip(), context)
+        # ChatRAG é síncrono: roda em threads para não bloquear o event loop
+        async with _query_semaphore:
+            started_at = time.perf_counter()
+            
+            # Buscar contexto
+            context = await asyncio.to_thread(chat_rag.search_context, query)
+            
+            # Gerar resposta
+            response = await asyncio.to_thread(chat_rag.generate_response, query, context)
         
-        logger.info(f"✅ Resposta gerada ({len(response)} chars)")
+        if not response.startswith(_ERROR_RESPONSE_PREFIX):
+            _response_cache.put(query, embedding, response)
+        
+        finished_at = time.perf_counter()
+        logger.info(
+            f"✅ Resposta gerada ({len(response)} chars) em {finished_at - received_at:.2f}s "
+            f"(fila: {started_at - received_at:.2f}s)"
+        )
         return response
         
     except Exception as e:
@@ -111,12 +280,21 @@ async def get_stats():
         return {
             "notes_count": stats.get('count', 0),
             "chunk_count": chat_rag.rag_chunk_count,
-            "database_path": str(chat_rag.indexer.persist_directory)
+            "database_path": str(chat_rag.indexer.persist_directory),
+            "response_cache": _response_cache.stats()
         }
     except Exception as e:
         logger.error(f"❌ Erro ao obter estatísticas: {e}")
         raise HTTPException(status_code=500, detail=f"Erro interno: {str(e)}")
 
+@app.post("/cache/clear")
+async def clear_cache():
+    """Descarta o cache de respostas das consultas"""
+    stats = _response_cache.stats()
+    _response_cache.clear()
+    logger.info(f"🧹 Cache de respostas limpo ({stats['entries']} entradas)")
+    return {"cleared": stats['entries'], "hits": stats['hits'], "misses": stats['misses']}
+
 if __name__ == "__main__":
     # Configuração para desenvolvimento
     uvicorn.run(
@@ -0,0 +1,82 @@
+"""
+Testes do parser de texto OCR (validação e limpeza da saída do LLM)
+
+As chamadas ao LLM são substituídas por respostas fixas; nenhum acesso à rede.
+"""
+
+import json
+
+import pytest
+
+pytest.importorskip("openai")
+
+from src import parser
+
+
+def _note(**overrides):
+    """Nota válida mínima, com campos sobrescritos conforme o teste"""
+    note = {
+        "title": "Nota",
+        "data": "01/01/25",
+        "summary": "Resumo",
+        "keywords": ["a"],
+        "tasks": [{"task": "x", "status": "todo"}],
+        "notes": [],
+        "reminders": [],
+    }
+    note.update(overrides)
+    return note
+
+
+def test_validate_accepts_valid_note():
+    assert parser._validate_json_structure(_note()) is True
+
+
+@pytest.mark.parametrize("status", [["done"], {}, None, 1])
+def test_validate_rejects_non_string_status(status):
+    assert parser._validate_json_structure(_note(tasks=[{"task": "x", "status": status}])) is False
+
+
+def test_clean_turns_non_string_status_into_todo():
+    cleaned = parser.clean_and_validate_json(_note(tasks=[
+        {"task": "a", "status": ["done"]},
+        {"task": "b", "status": {}},
+        {"task": "c", "status": "done"},
+        {"task": "d"},
+    ]))
+    assert cleaned["tasks"] == [
+        {"task": "a", "status": "todo"},
+        {"task": "b", "status": "todo"},
+        {"task": "c", "status": "done"},
+        {"task": "d", "status": "todo"},
+    ]
+
+
+def test_parse_ocr_batch_retries_only_malformed_items(monkeypatch):
+    good_a, good_c = _note(title="A"), _note(title="C")
+    malformed = _note(title="B", tasks=[{"task": "x", "status": ["done"]}])
+    retried = _note(title="B refeita")
+    calls = []
+    
+    def fake_complete(system_prompt, user_content, max_tokens):
+        calls.append(user_content)
+        if user_content.startswith("Estruture as seguintes"):
+            return json.dumps([good_a, malformed, good_c])
+        return json.dumps(retried)
+    
+    monkeypatch.setattr(parser, "_complete", fake_complete)
+    
+    # Validador que falha com exceção em um item não deve abortar o lote
+    validate = parser._validate_json_structure
+    
+    def raising_validate(json_data):
+        if json_data.get("title") == "B":
+            raise TypeError("unhashable type: 'list'")
+        return validate(json_data)
+    
+    monkeypatch.setattr(parser, "_validate_json_structure", raising_validate)
+    
+    results = parser.parse_ocr_batch(["texto A", "texto B", "texto C"], batch_size=3)
+    
+    assert [r["title"] for r in results] == ["A", "B refeita", "C"]
+    assert len(calls) == 2